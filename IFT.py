@@ -1,103 +1,19 @@
+import time
+SCRIPT_STARTED = time.perf_counter()
+
 import os
-import json
-import re
 import difflib
-import requests
-import javalang
-import tempfile
-import subprocess
 import streamlit as st
-import numpy as np
-from dotenv import load_dotenv
-from urllib.parse import urlparse
-from difflib import SequenceMatcher
-from rouge import Rouge
-from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-# List your four models here
-MODELS = [
-    "llama-3.3-70b-versatile",
-    "gemma2-9b-it",
-    "llama3-70b-8192",
-    "llama3-8b-8192",
-]
-
-def parse_bug_sample(path):
-    try:
-        with open(os.path.join(path, "bug.json")) as f:
-            bug_meta = json.load(f)
-        with open(os.path.join(path, "method_before.txt")) as f:
-            before = f.read()
-        with open(os.path.join(path, "method_after.txt")) as f:
-            after = f.read()
-        return {"bug_meta": bug_meta, "before": before, "after": after}
-    except Exception as e:
-        st.error(f"Error reading files: {e}")
-        return None
-
-def call_groq_fix_model(code, meta, model_name):
-    prompt = (
-        "You are an expert Java developer. Fix the following buggy method, preserving its logic.\n"
-        f"Bug Type: {meta.get('bug_type','Unknown')}\n"
-        f"Severity: {meta.get('severity','Unknown')}\n"
-        f"Location: Line {meta.get('line_number','Unknown')}\n\n"
-        "Buggy Method:\n"
-        f"```java\n{code.strip()}\n```\n\n"
-        "Respond ONLY with the corrected method in a Java code block."
-    )
-    r = requests.post(
-        "https://api.groq.com/openai/v1/chat/completions",
-        headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
-        json={
-            "model": model_name,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.0,
-            "top_p": 1.0,
-            "max_tokens": 1024
-        },
-    )
-    if r.status_code == 200:
-        return r.json()["choices"][0]["message"]["content"]
-    st.error(f"API error {r.status_code}: {r.text}")
-    return ""
-
-def strip_md(code):
-    return re.sub(r'```[a-z]*\n([\s\S]*?)```', r'\1', code).strip()
-
-def normalize(code):
-    code = re.sub(r'//.*', '', code)
-    code = re.sub(r'/\*[\s\S]*?\*/', '', code)
-    code = re.sub(r'\s+', ' ', code)
-    return code.strip().lower()
-
-def ast_sim(c1, c2):
-    try:
-        t1 = javalang.parse.parse(c1)
-        t2 = javalang.parse.parse(c2)
-        return SequenceMatcher(None, str(t1), str(t2)).ratio()
-    except:
-        return 0.0
+from llm_cache import get_llm_cache
+from manifest import default_manifest_path
+import streaming
+import telemetry
+from benchmark import (
+    MODELS, MODEL_CONCURRENCY, select_samples, strip_md,
+    clone, run_benchmark, summarize,
+)
 
-def evaluate_fix(ref, pred):
-    r = strip_md(ref)
-    p = strip_md(pred)
-    rn = normalize(r)
-    pn = normalize(p)
-    smoothie = SmoothingFunction().method4
-    bleu = sentence_bleu([re.findall(r'\w+', rn)], re.findall(r'\w+', pn), smoothing_function=smoothie)
-    try:
-        rouge_l = Rouge().get_scores(pn, rn)[0]["rouge-l"]["f"]
-    except:
-        rouge_l = 0.0
-    lev = SequenceMatcher(None, pn, rn).ratio()
-    return {
-        "BLEU": round(bleu * 100, 2),
-        "ROUGE-L": round(rouge_l * 100, 2),
-        "Levenshtein": round(lev * 100, 2),
-    }
+IMPORT_SECONDS = time.perf_counter() - SCRIPT_STARTED
 
 def show_diff(a, b):
     return "\n".join(difflib.unified_diff(
@@ -105,58 +21,80 @@ def show_diff(a, b):
         fromfile="LLM Fix", tofile="Ground Truth", lineterm=""
     ))
 
-def traverse_and_fix(root, model_name):
-    results = []
-    count = 0
-    for d, _, files in os.walk(root):
-        if count >= 10:
-            break
-        if {"bug.json", "method_before.txt", "method_after.txt"} <= set(files):
-            sample = parse_bug_sample(d)
-            if not sample:
-                continue
-            st.markdown(f"#### 🐞 Bug #{count+1}: {d}")
-            st.code(sample["before"], language="java")
-            fix = call_groq_fix_model(sample["before"], sample["bug_meta"], model_name)
-            m = evaluate_fix(sample["after"], fix)
-            results.append(m)
-            count += 1
-    return results
-
 def clone_repo(url):
-    parts = urlparse(url).path.strip("/").split("/")
-    if len(parts) < 2:
-        st.error("Invalid GitHub URL.")
+    try:
+        return clone(url)
+    except ValueError as e:
+        st.error(str(e))
         return None, None
-    owner, repo = parts[:2]
-    tmp = tempfile.mkdtemp()
-    subprocess.run(["git", "clone", f"https://github.com/{owner}/{repo}.git", tmp], check=True)
-    sub = "/".join(parts[3:]) if "tree" in parts else ""
-    p = os.path.join(tmp, sub)
-    return tmp, p if os.path.isdir(p) else tmp
 
 st.set_page_config(page_title="InferredBugs LLM Fixer", layout="wide")
 st.title("CodeDoc IFT")
 
 repo = st.text_input("GitHub URL to subdirectory")
-if repo and st.button("Clone & Compare Models"):
+stream_responses = st.checkbox("📡 Stream responses (measures time-to-first-token)", value=True)
+sample_limit = st.number_input("Bug samples", min_value=1, value=10)
+rescan = st.checkbox("🔄 Rescan the sample corpus", value=False)
+concurrency = st.slider("Concurrent requests per model", 1, 16, MODEL_CONCURRENCY)
+patch_mode = st.checkbox("🩹 Ask for patches instead of whole methods (applied locally before scoring)", value=False)
+def render_comparison(last_run):
+    """Per-model results, comparison table and timing panel of a finished run."""
+    records = last_run["records"]
+    for model in MODELS:
+        with st.expander(f"Results for **{model}**"):
+            for n, r in enumerate(sorted((r for r in records if r["model"] == model), key=lambda r: r["sample"])):
+                st.markdown(f"#### 🐞 Bug #{n+1}: {r['sample']}")
+                if r["error"]:
+                    st.error(r["error"])
+                    continue
+                if r.get("patch_error"):
+                    st.warning(f"⚠️ Patch did not apply: {r['patch_error']}")
+                st.code(show_diff(strip_md(r["prediction"]), last_run["ground_truth"][r["sample"]]), language="diff")
+                st.caption(f"BLEU {r['BLEU']:.2f} · ROUGE-L {r['ROUGE-L']:.2f} · Levenshtein {r['Levenshtein']:.2f} · "
+                           + (f"AST {r['AST']:.2f} · " if r.get("AST") is not None else "")
+                           + streaming.format_stats({"model": model, **{k: r[k] for k in ("ttft", "duration", "completion_tokens", "tokens_per_sec", "cached")}}))
+    st.subheader("📊 Model Comparison")
+    st.table(summarize(records, MODELS))
+    st.caption(last_run["cache_summary"])
+    jsonl_path, prom_path = last_run["exports"]
+    with st.expander("📈 Pipeline timings"):
+        st.table(last_run["run"].summary())
+        st.caption(f"Exported to `{jsonl_path}` and `{prom_path}`")
+
+# Kept in session state so widget changes re-render the last comparison instead of clearing it
+run_requested = repo and st.button("Clone & Compare Models")
+last_run = st.session_state.get("ift_run")
+if not run_requested and last_run and last_run["key"] == (repo, patch_mode):
+    render_comparison(last_run)
+
+if run_requested:
     with st.spinner("Cloning and analyzing across models..."):
         tmp, path = clone_repo(repo)
         if not path or not os.path.isdir(path):
             st.error("Bad path after clone.")
         else:
-            table = []
-            for model in MODELS:
-                st.write(f"## Running on model: **{model}**")
-                res = traverse_and_fix(path, model)
-                avg_bleu = np.mean([r["BLEU"] for r in res])
-                avg_rouge = np.mean([r["ROUGE-L"] for r in res])
-                avg_lev   = np.mean([r["Levenshtein"] for r in res])
-                table.append({
-                    "Model": model,
-                    "Avg BLEU": f"{avg_bleu:.2f}",
-                    "Avg ROUGE-L": f"{avg_rouge:.2f}",
-                    "Avg Levenshtein": f"{avg_lev:.2f}"
-                })
-            st.subheader("📊 Model Comparison")
-            st.table(table)
+            samples, errors = select_samples(path, int(sample_limit), manifest_path=default_manifest_path(repo), refresh=rescan)
+            for error in errors:
+                st.error(f"Error reading files: {error}")
+            progress = st.progress(0.0)
+            total = max(1, len(samples) * len(MODELS))
+            done = []
+
+            def on_result(record):
+                done.append(record)
+                progress.progress(len(done) / total, text=f"{len(done)}/{total}: {record['model']}")
+
+            run = telemetry.Run("ift")
+            records = run_benchmark(samples, MODELS, concurrency, stream=stream_responses, on_result=on_result, run=run,
+                                    patch=patch_mode)
+            st.session_state["ift_run"] = {
+                "key": (repo, patch_mode),
+                "records": records,
+                "ground_truth": {s["path"]: s["after"] for s in samples},
+                "cache_summary": get_llm_cache().summary(),
+                "run": run,
+                "exports": run.export(),
+            }
+            render_comparison(st.session_state["ift_run"])
+
+st.caption(f"⏱️ Script run {(time.perf_counter() - SCRIPT_STARTED) * 1000:.0f} ms (imports {IMPORT_SECONDS * 1000:.0f} ms)")
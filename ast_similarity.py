@@ -0,0 +1,136 @@
+import os
+import hashlib
+import threading
+from collections import Counter
+from functools import lru_cache
+from disk_cache import CACHE_DIR, DiskCache
+
+AST_CACHE_MB = int(os.getenv("CODEDOC_AST_CACHE_MB", "64"))
+FINGERPRINT_VERSION = 1  # bump when labels or hashing change, so stale cached fingerprints are ignored
+
+# Attributes that identify a node (names, literals, operators); everything else is structure
+LABEL_ATTRS = ("name", "member", "value", "operator", "prefix_operators", "postfix_operators",
+               "qualifier", "modifiers", "dimensions")
+SKIP_ATTRS = ("documentation",)
+
+_FRAGMENT_CLASS = "class CodeDocFragment {\n%s\n}"
+_FRAGMENT_METHOD = "class CodeDocFragment { void codeDocFragment() {\n%s\n} }"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _disk_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(os.path.join(CACHE_DIR, "ast"), AST_CACHE_MB * 1024 * 1024)
+        return _cache
+
+
+def parse_fragment(code):
+    """Parses Java source into a list of top-level nodes, or None if it does not parse.
+
+    Tries a full compilation unit first, then class members (bare methods, fields), then
+    statements; the wrapper class and method are dropped from the result.
+    """
+    import javalang  # only needed when a structural score is requested
+    try:
+        return [javalang.parse.parse(code)]
+    except Exception:
+        pass
+    try:
+        unit = javalang.parse.parse(_FRAGMENT_CLASS % code)
+        return list(unit.types[0].body)
+    except Exception:
+        pass
+    try:
+        unit = javalang.parse.parse(_FRAGMENT_METHOD % code)
+        return list(unit.types[0].body[0].body or [])
+    except Exception:
+        return None
+
+
+def _label(node):
+    parts = [type(node).__name__]
+    for attr in LABEL_ATTRS:
+        value = getattr(node, attr, None)
+        if value:
+            parts.append(",".join(sorted(map(str, value))) if isinstance(value, (set, list)) else str(value))
+    return "|".join(parts)
+
+
+def _children(node):
+    for attr in node.attrs:
+        if attr in LABEL_ATTRS or attr in SKIP_ATTRS:
+            continue
+        stack = [getattr(node, attr, None)]
+        while stack:
+            value = stack.pop(0)
+            if isinstance(value, (list, tuple)):
+                stack[:0] = value
+            elif hasattr(value, "attrs"):
+                yield value
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def fingerprint(nodes):
+    """Multiset of subtree hashes, one per node: equal hashes mean identical subtrees."""
+    hashes = Counter()
+
+    def walk(node):
+        h = _hash(_label(node) + "(" + ",".join(str(walk(child)) for child in _children(node)) + ")")
+        hashes[h] += 1
+        return h
+
+    for node in nodes:
+        walk(node)
+    return hashes
+
+
+def code_fingerprint(code):
+    """Fingerprint of a snippet, or None if it does not parse."""
+    try:
+        nodes = parse_fragment(code)
+        return None if nodes is None else fingerprint(nodes)
+    except RecursionError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def reference_fingerprint(code):
+    """Fingerprint of a ground truth, cached in memory and on disk so every model and run parses it once."""
+    key = f"v{FINGERPRINT_VERSION}:{code}"
+    entry = _disk_cache().get(key)
+    if entry is not None:
+        return None if entry["hashes"] is None else Counter(dict(entry["hashes"]))
+    hashes = code_fingerprint(code)
+    _disk_cache().set(key, {"hashes": None if hashes is None else list(hashes.items())})
+    return hashes
+
+
+def similarity(a, b):
+    """Dice overlap of two fingerprints, in [0, 1]."""
+    total = sum(a.values()) + sum(b.values())
+    if not total:
+        return 1.0
+    common = sum(min(n, b[h]) for h, n in a.items() if h in b)
+    return 2.0 * common / total
+
+
+def ast_similarity(reference, prediction):
+    """Structural similarity of two Java snippets (whole files, methods or statements).
+
+    Linear in the size of both trees. Returns None when the reference does not parse (the pair
+    cannot be scored) and 0.0 when only the prediction does not.
+    """
+    ref = reference_fingerprint(reference)
+    if ref is None:
+        return None
+    pred = code_fingerprint(prediction)
+    if pred is None:
+        return 0.0
+    return similarity(ref, pred)
@@ -0,0 +1,322 @@
+"""Headless InferredBugs benchmark: every (model, sample) pair, run concurrently, results as JSON lines.
+
+    python benchmark.py path/to/samples --limit 200 --output results.jsonl
+    python benchmark.py https://github.com/user/repo/tree/main/java --models gemma2-9b-it --resume
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from metrics import score_normalized
+from ast_similarity import ast_similarity
+from http_client import get_session
+from clone_cache import get_clone_cache, parse_source
+from manifest import default_manifest_path, get_manifest, stratified_sample, shard
+from llm_cache import cached_completion
+import streaming
+import token_budget
+import patching
+import telemetry
+from scheduler import get_scheduler
+
+load_dotenv()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_CHAT_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/") + "/openai/v1/chat/completions"  # same variable the Groq SDK reads
+MODEL_CONCURRENCY = int(os.getenv("CODEDOC_MODEL_CONCURRENCY", "4"))
+
+# List your four models here
+MODELS = [
+    "llama-3.3-70b-versatile",
+    "gemma2-9b-it",
+    "llama3-70b-8192",
+    "llama3-8b-8192",
+]
+
+
+def load_samples(root, entries):
+    """Reads the method files for manifest entries. Returns (samples, errors)."""
+    samples, errors = [], []
+    for entry in entries:
+        d = os.path.join(root, entry["path"])
+        try:
+            with open(os.path.join(d, "method_before.txt")) as f:
+                before = f.read()
+            with open(os.path.join(d, "method_after.txt")) as f:
+                after = f.read()
+        except OSError as e:
+            errors.append(f"{d}: {e}")
+            continue
+        samples.append({"path": d, "bug_meta": entry["meta"], "before": before, "after": after})
+    return samples, errors
+
+
+def select_samples(root, limit=None, seed=0, shard_spec=None, manifest_path=None, refresh=False):
+    """Manifest-backed sample selection: stratified by bug type and severity, optionally sharded.
+
+    ``shard_spec`` is ``(index, count)``. Returns (samples, errors).
+    """
+    entries, errors = get_manifest(root, manifest_path, refresh)
+    entries = stratified_sample(entries, limit, seed=seed)
+    if shard_spec:
+        entries = shard(entries, *shard_spec)
+    samples, read_errors = load_samples(root, entries)
+    return samples, errors + read_errors
+
+
+def build_fix_prompt(code, meta, patch=False):
+    answer = (
+        "Respond ONLY with the changes, in a diff code block.\n" + patching.PATCH_INSTRUCTIONS if patch
+        else "Respond ONLY with the corrected method in a Java code block."
+    )
+    return (
+        "You are an expert Java developer. Fix the following buggy method, preserving its logic.\n"
+        f"Bug Type: {meta.get('bug_type','Unknown')}\n"
+        f"Severity: {meta.get('severity','Unknown')}\n"
+        f"Location: Line {meta.get('line_number','Unknown')}\n\n"
+        "Buggy Method:\n"
+        f"```java\n{code.strip()}\n```\n\n"
+        f"{answer}"
+    )
+
+
+def request_fix(code, meta, model_name, on_text=None, stats=None, patch=False):
+    """Asks a Groq model for the fixed method (or, with ``patch``, for search/replace blocks). Raises on API errors.
+
+    ``max_tokens`` grows with the method (a fixed method is about as long as the buggy one), and
+    prompts that cannot fit the model fail with ``PromptTooLarge`` before any request is sent.
+    """
+    messages = [{"role": "user", "content": build_fix_prompt(code, meta, patch)}]
+    expected = patching.PATCH_TOKENS // 2 if patch else token_budget.count_tokens(code, model_name) + 64
+    max_tokens = token_budget.completion_budget(model_name, expected)
+    prompt_tokens = token_budget.count_messages(messages, model_name)
+    if prompt_tokens > token_budget.prompt_capacity(model_name, max_tokens):
+        raise token_budget.PromptTooLarge(
+            f"{model_name}: prompt needs {prompt_tokens} tokens, only "
+            f"{token_budget.prompt_capacity(model_name, max_tokens)} fit next to {max_tokens} output tokens"
+        )
+    params = {"temperature": 0.0, "top_p": 1.0, "max_tokens": max_tokens}
+    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
+    payload = {"model": model_name, "messages": messages, **params}
+    if stats is None:
+        stats = streaming.new_stats(model_name)
+
+    def call():
+        if on_text is not None:
+            return get_scheduler().call(
+                "groq", model_name, lambda: streaming.stream_http(GROQ_CHAT_URL, headers, payload, on_text, stats)
+            )
+        start = time.perf_counter()
+        r = get_scheduler().send("groq", model_name, lambda: get_session().post(GROQ_CHAT_URL, headers=headers, json=payload))
+        if r.status_code != 200:
+            raise RuntimeError(f"API error {r.status_code}: {r.text}")
+        text = r.json()["choices"][0]["message"]["content"]
+        streaming.finish_stats(stats, start, None, text, r.json().get("usage"))
+        return text
+
+    response = cached_completion(model_name, messages, call, **params)
+    streaming.settle_stats(stats)
+    return response
+
+
+def strip_md(code):
+    return re.sub(r'```[a-z]*\n([\s\S]*?)```', r'\1', code).strip()
+
+def normalize(code):
+    code = re.sub(r'//.*', '', code)
+    code = re.sub(r'/\*[\s\S]*?\*/', '', code)
+    code = re.sub(r'\s+', ' ', code)
+    return code.strip().lower()
+
+@lru_cache(maxsize=4096)
+def normalized_reference(ref):
+    """Ground truths are the same for every model, so they are normalized once."""
+    return normalize(strip_md(ref))
+
+def evaluate_fix(ref, pred):
+    """Scores one prediction against its ground truth; the reference's preparation is cached across models.
+
+    "AST" is structural similarity of the Java syntax trees; None when the reference does not parse.
+    """
+    scores = score_normalized(normalized_reference(ref), normalize(strip_md(pred)))
+    structural = ast_similarity(strip_md(ref), strip_md(pred))
+    return {
+        "BLEU": round(scores["BLEU"] * 100, 2),
+        "ROUGE-L": round(scores["ROUGE-L"] * 100, 2),
+        "Levenshtein": round(scores["Levenshtein"] * 100, 2),
+        "AST": None if structural is None else round(structural * 100, 2),
+    }
+
+
+def clone(url):
+    """Checks out a GitHub URL (optionally ``/tree/<branch>/<subdir>``) or other git remote from the clone cache.
+
+    Returns (checkout, sample_root). Raises ``CloneError`` (a ValueError) if git fails.
+    """
+    remote, ref, subdir = parse_source(url)
+    root, _ = get_clone_cache().checkout(remote, ref, subdir)
+    p = os.path.join(root, subdir) if subdir else root
+    return root, p if os.path.isdir(p) else root
+
+
+def completed_keys(output):
+    """(model, sample path) pairs already recorded without error in an existing results file."""
+    keys = set()
+    if output and os.path.exists(output):
+        with open(output) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not record.get("error"):
+                    keys.add((record["model"], record["sample"]))
+    return keys
+
+
+def run_benchmark(samples, models=MODELS, concurrency=MODEL_CONCURRENCY, output=None, stream=False,
+                  on_result=None, skip=(), run=None, patch=False):
+    """Runs every (model, sample) pair; each model gets its own pool of ``concurrency`` workers.
+
+    ``concurrency`` may also be a {model: cap} dict. Each record is appended to ``output`` (JSON
+    lines) as soon as it is scored, and passed to ``on_result``. Pairs in ``skip`` are not rerun.
+    Stage timings go to ``run`` (a ``telemetry.Run``) when given. With ``patch`` the models return
+    search/replace blocks, which are applied to the buggy method before scoring; a patch that does
+    not apply scores as an empty prediction. Returns all new records.
+    """
+    caps = concurrency if isinstance(concurrency, dict) else {m: concurrency for m in models}
+    write_lock = threading.Lock()
+    out = open(output, "a", encoding="utf-8") if output else None
+    records = []
+
+    def run_one(model, sample):
+        stats = streaming.new_stats(model)
+        record = {"model": model, "sample": sample["path"],
+                  "bug_type": sample["bug_meta"].get("bug_type"), "severity": sample["bug_meta"].get("severity")}
+        try:
+            with telemetry.activate(run), telemetry.stage("llm", sample["path"], model=model):
+                fix = request_fix(sample["before"], sample["bug_meta"], model,
+                                  (lambda text: None) if stream else None, stats, patch)
+                telemetry.note_llm(stats)
+            if patch:
+                record["patch"] = fix
+                fix, record["patch_error"] = patching.try_apply(sample["before"], strip_md(fix))
+                fix = fix or ""
+            with telemetry.activate(run), telemetry.stage("scoring", sample["path"], model=model):
+                record.update(evaluate_fix(sample["after"], fix))
+            record["error"] = None
+        except Exception as e:
+            fix = ""
+            record["error"] = str(e)
+        record.update({"ttft": stats["ttft"], "duration": stats["duration"], "tokens_per_sec": stats["tokens_per_sec"],
+                       "completion_tokens": stats["completion_tokens"], "cached": stats["cached"], "prediction": fix})
+        return record
+
+    pools = {m: ThreadPoolExecutor(max_workers=max(1, caps.get(m, MODEL_CONCURRENCY))) for m in models}
+    try:
+        futures = [
+            pools[m].submit(run_one, m, sample)
+            for sample in samples for m in models
+            if (m, sample["path"]) not in skip
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                if out:
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                records.append(record)
+            if on_result:
+                on_result(record)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+        if out:
+            out.close()
+    return records
+
+
+def summarize(records, models=None):
+    """Per-model averages over successful records."""
+    models = models or sorted({r["model"] for r in records})
+    rows = []
+    for model in models:
+        ok = [r for r in records if r["model"] == model and not r.get("error")]
+        mean = lambda key: round(sum(r[key] for r in ok if r.get(key) is not None) / max(1, sum(r.get(key) is not None for r in ok)), 2)
+        rows.append({
+            "Model": model,
+            "Samples": len(ok),
+            "Errors": sum(1 for r in records if r["model"] == model and r.get("error")),
+            "Avg BLEU": mean("BLEU"),
+            "Avg ROUGE-L": mean("ROUGE-L"),
+            "Avg Levenshtein": mean("Levenshtein"),
+            "Avg AST": mean("AST"),
+            "Avg TTFT (s)": mean("ttft"),
+            "Avg Tokens/s": mean("tokens_per_sec"),
+            "Avg Output Tokens": mean("completion_tokens"),
+            "Avg Latency (s)": mean("duration"),
+        })
+        if any("patch" in r for r in ok):
+            rows[-1]["Patches Not Applied"] = sum(1 for r in ok if r.get("patch_error"))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Groq models on InferredBugs-style samples.")
+    parser.add_argument("source", help="local sample directory or GitHub URL (optionally /tree/<branch>/<subdir>)")
+    parser.add_argument("--models", nargs="+", default=MODELS)
+    parser.add_argument("--limit", type=int, default=None, help="number of samples, stratified by bug type and severity")
+    parser.add_argument("--seed", type=int, default=0, help="seed for sample selection")
+    parser.add_argument("--shard", default=None, help="run one shard of the samples, e.g. 0/4")
+    parser.add_argument("--manifest", default=None, help="sample manifest file (default: under the cache dir)")
+    parser.add_argument("--refresh", action="store_true", help="rescan the corpus for new or changed samples")
+    parser.add_argument("--concurrency", type=int, default=MODEL_CONCURRENCY, help="concurrent requests per model")
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    parser.add_argument("--resume", action="store_true", help="skip pairs already recorded in --output")
+    parser.add_argument("--stream", action="store_true", help="stream responses to measure time-to-first-token")
+    parser.add_argument("--patch", action="store_true", help="ask for search/replace patches instead of whole methods")
+    args = parser.parse_args(argv)
+
+    if not GROQ_API_KEY:
+        print("GROQ_API_KEY is not set.", file=sys.stderr)
+        return 2
+    root = args.source
+    manifest_path = args.manifest or default_manifest_path(args.source)
+    if not os.path.isdir(root):
+        _, root = clone(args.source)
+
+    started = time.perf_counter()
+    shard_spec = tuple(int(x) for x in args.shard.split("/")) if args.shard else None
+    samples, errors = select_samples(root, args.limit, args.seed, shard_spec, manifest_path, args.refresh)
+    for error in errors:
+        print(f"skipped {error}", file=sys.stderr)
+    skip = completed_keys(args.output) if args.resume else set()
+    if not args.resume and os.path.exists(args.output):
+        os.remove(args.output)
+
+    done = [0]
+    total = len(samples) * len(args.models) - len(skip)
+
+    def progress(record):
+        done[0] += 1
+        status = record["error"] or f"BLEU {record['BLEU']:.2f}"
+        print(f"[{done[0]}/{total}] {record['model']} {record['sample']}: {status}", file=sys.stderr)
+
+    run = telemetry.Run("benchmark")
+    records = run_benchmark(samples, args.models, args.concurrency, args.output, args.stream, progress, skip, run, args.patch)
+    for row in summarize(records, args.models):
+        print(json.dumps(row))
+    for row in run.summary():
+        print(json.dumps(row), file=sys.stderr)
+    print("timings exported to " + " and ".join(run.export()), file=sys.stderr)
+    print(f"{len(records)} results in {time.perf_counter() - started:.1f}s -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
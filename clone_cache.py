@@ -0,0 +1,190 @@
+import os
+import shutil
+import hashlib
+import threading
+import subprocess
+from urllib.parse import urlparse
+from disk_cache import CACHE_DIR
+
+CLONE_DIR = os.path.join(CACHE_DIR, "clones")
+CLONE_CACHE_MB = int(os.getenv("CODEDOC_CLONE_CACHE_MB", "2048"))
+GIT_TIMEOUT = int(os.getenv("CODEDOC_GIT_TIMEOUT", "600"))
+MIRROR = "mirror.git"
+
+
+class CloneError(ValueError):
+    """The repository could not be cloned or updated."""
+
+
+def _git(*args, cwd=None):
+    try:
+        done = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, text=True, timeout=GIT_TIMEOUT,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise CloneError(f"git {args[0]} failed: {e}")
+    if done.returncode != 0:
+        raise CloneError(f"git {args[0]} failed: {done.stderr.strip() or done.stdout.strip()}")
+    return done.stdout.strip()
+
+
+def parse_source(url):
+    """Splits a source into (remote, ref, subdir).
+
+    GitHub URLs may point at a branch and subdirectory (``/tree/<branch>/<subdir>``); any other
+    git remote (a local path, ``file://`` or ``ssh`` URL) is used as-is, at its default branch.
+    """
+    parsed = urlparse(url)
+    if parsed.netloc != "github.com":
+        if not url.strip():
+            raise CloneError("Invalid repository URL.")
+        return url, None, ""
+    parts = parsed.path.strip("/").split("/")
+    if len(parts) < 2:
+        raise CloneError("Invalid GitHub URL.")
+    owner, repo = parts[0], parts[1].removesuffix(".git")
+    ref, subdir = None, ""
+    if len(parts) > 3 and parts[2] == "tree":
+        ref, subdir = parts[3], "/".join(parts[4:])
+    return f"https://github.com/{owner}/{repo}.git", ref, subdir
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class CloneCache:
+    """Local mirrors of remote repositories with one sparse checkout per commit.
+
+    Each remote gets a shallow, blob-filtered bare mirror (``mirror.git``) that later runs update
+    with a depth-1 fetch; commits are checked out as worktrees named by their SHA, containing only
+    the requested subdirectories, so blobs outside them are never downloaded. Checkouts (and
+    mirrors left without any) are evicted least-recently-used once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory=CLONE_DIR, max_bytes=CLONE_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.RLock())
+
+    def checkout(self, remote, ref=None, subdir=""):
+        """Returns (checkout_dir, commit) for ``ref`` (default branch if None) of ``remote``."""
+        key = hashlib.sha256(remote.encode("utf-8")).hexdigest()[:16]
+        repo_dir = os.path.join(self.directory, key)
+        mirror = os.path.join(repo_dir, MIRROR)
+        subdir = subdir.strip("/")
+        with self._lock(key):
+            commit = self._update(remote, ref, repo_dir, mirror)
+            root = os.path.join(repo_dir, commit)
+            if not os.path.isdir(root):
+                _git("worktree", "prune", cwd=mirror)
+                _git("worktree", "add", "--no-checkout", "--detach", root, commit, cwd=mirror)
+                if subdir:
+                    _git("sparse-checkout", "set", "--cone", subdir, cwd=root)
+                _git("checkout", "--quiet", cwd=root)  # fetches only the blobs the checkout needs
+            elif not os.path.isdir(os.path.join(root, subdir)) or not subdir:
+                # An earlier run checked out other subdirectories of this commit
+                try:
+                    sparse = _git("config", "--bool", "core.sparseCheckout", cwd=root) == "true"
+                except CloneError:
+                    sparse = False  # unset
+                if sparse:
+                    _git(*(["sparse-checkout", "add", subdir] if subdir else ["sparse-checkout", "disable"]), cwd=root)
+            os.utime(root)
+        self.evict(keep=root)
+        return root, commit
+
+    def _update(self, remote, ref, repo_dir, mirror):
+        """Fetches the tip of ``ref`` into the mirror (creating it first) and returns its commit."""
+        pin = f"refs/codedoc/{ref or 'HEAD'}"
+        if not os.path.isdir(mirror):
+            os.makedirs(repo_dir, exist_ok=True)
+            staging = os.path.join(repo_dir, ".staging.git")
+            shutil.rmtree(staging, ignore_errors=True)
+            args = ["clone", "--quiet", "--bare", "--filter=blob:none", "--depth", "1", "--single-branch"]
+            _git(*args, *(["--branch", ref] if ref else []), remote, staging)
+            os.replace(staging, mirror)
+            commit = _git("rev-parse", "HEAD^{commit}", cwd=mirror)
+        else:
+            try:
+                _git("fetch", "--quiet", "--depth", "1", "origin", ref or "HEAD", cwd=mirror)
+                commit = _git("rev-parse", "FETCH_HEAD^{commit}", cwd=mirror)
+            except CloneError as e:
+                # Offline or the remote is down: fall back to the last commit seen for this ref
+                try:
+                    commit = _git("rev-parse", "--verify", "--quiet", pin, cwd=mirror)
+                except CloneError:
+                    raise e
+                print(f"[⚠️ Fetch failed, using cached {commit[:12]}] {e}")
+        _git("update-ref", pin, commit, cwd=mirror)  # also keeps the commit from being pruned
+        os.utime(mirror)
+        return commit
+
+    def entries(self):
+        """(last_used, size, repo_dir, checkout_dir) for every checkout, oldest first."""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for key in os.listdir(self.directory):
+            repo_dir = os.path.join(self.directory, key)
+            if not os.path.isdir(repo_dir):
+                continue
+            for name in os.listdir(repo_dir):
+                if name == MIRROR or name.startswith("."):
+                    continue
+                path = os.path.join(repo_dir, name)
+                found.append((os.path.getmtime(path), _dir_size(path), repo_dir, path))
+        return sorted(found)
+
+    def evict(self, keep=None):
+        """Removes least-recently-used checkouts until the cache fits in ``max_bytes``."""
+        if not os.path.isdir(self.directory):
+            return
+        checkouts = self.entries()
+        mirrors = {repo_dir: _dir_size(os.path.join(repo_dir, MIRROR)) for _, _, repo_dir, _ in checkouts}
+        total = sum(size for _, size, _, _ in checkouts) + sum(mirrors.values())
+        remaining = {repo_dir: 0 for repo_dir in mirrors}
+        for _, _, repo_dir, path in checkouts:
+            remaining[repo_dir] += 1
+        for _, size, repo_dir, path in checkouts:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with self._lock(os.path.basename(repo_dir)):
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                remaining[repo_dir] -= 1
+                if remaining[repo_dir] == 0:
+                    shutil.rmtree(repo_dir, ignore_errors=True)
+                    total -= mirrors[repo_dir]
+                else:
+                    try:
+                        _git("worktree", "prune", cwd=os.path.join(repo_dir, MIRROR))
+                    except CloneError:
+                        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_clone_cache():
+    """Returns the process-wide clone cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CloneCache()
+        return _cache
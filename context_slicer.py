@@ -0,0 +1,232 @@
+import os
+import re
+import ast
+
+CONTEXT_TOKENS = int(os.getenv("CODEDOC_CONTEXT_TOKENS", "6000"))
+HEADER_LINES = 40
+WINDOW_LINES = 20
+MARKER_RE = re.compile(r"^\s*(?:#|//)\s*--- lines (\d+)-(\d+) ---\s*$")
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+COMMENT_PREFIX = {"Python": "#"}
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def python_units(source):
+    """Returns (name, start, end) for every function/method and method-less class, 1-based and inclusive."""
+    tree = ast.parse(source)
+    units = []
+
+    def visit(node, inside_function):
+        for child in ast.iter_child_nodes(node):
+            is_function = isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            if is_function and not inside_function:
+                start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                units.append((child.name, start, child.end_lineno))
+            elif isinstance(child, ast.ClassDef) and not inside_function:
+                if not any(isinstance(c, (ast.FunctionDef, ast.AsyncFunctionDef)) for c in child.body):
+                    start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                    units.append((child.name, start, child.end_lineno))
+            visit(child, inside_function or is_function)
+
+    visit(tree, False)
+    return units
+
+
+def java_units(source):
+    """Returns (name, start, end) for every method and constructor, matching braces on javalang tokens."""
+    import javalang
+
+    tree = javalang.parse.parse(source)
+    tokens = list(javalang.tokenizer.tokenize(source))
+    units = []
+    for _, node in tree.filter(javalang.tree.MethodDeclaration):
+        units.append((node.name, node.position))
+    for _, node in tree.filter(javalang.tree.ConstructorDeclaration):
+        units.append((node.name, node.position))
+
+    result = []
+    for name, position in units:
+        if position is None:
+            continue
+        i = next((k for k, t in enumerate(tokens) if t.position.line >= position.line), None)
+        if i is None:
+            continue
+        # The body starts at the first "{" before any ";" (abstract/interface methods have none)
+        while i < len(tokens) and tokens[i].value not in ("{", ";"):
+            i += 1
+        if i == len(tokens) or tokens[i].value == ";":
+            end = tokens[min(i, len(tokens) - 1)].position.line
+        else:
+            depth = 0
+            for token in tokens[i:]:
+                if token.value == "{":
+                    depth += 1
+                elif token.value == "}":
+                    depth -= 1
+                    if depth == 0:
+                        end = token.position.line
+                        break
+            else:
+                end = tokens[-1].position.line
+        result.append((name, position.line, end))
+    return result
+
+
+def find_units(source, language):
+    """Parses the file into structural units, or returns None when it cannot be parsed."""
+    try:
+        if language == "Python":
+            return python_units(source)
+        if language == "Java":
+            return java_units(source)
+    except Exception as e:
+        print(f"[✂️ Parse Fallback] {e}")
+    return None
+
+
+def stack_lines(issue_body, file_path):
+    """Line numbers of this file mentioned in stack traces (``File "x.py", line 3`` / ``(X.java:3)``)."""
+    if not issue_body or not file_path:
+        return set()
+    name = re.escape(os.path.basename(file_path))
+    pattern = rf"{name}\"?(?:, line |:)(\d+)"
+    return {int(n) for n in re.findall(pattern, issue_body)}
+
+
+class CodeContext:
+    """The part of a file sent to the model, and the mapping back into the full file."""
+
+    def __init__(self, source, regions, language):
+        self.source = source
+        self.lines = source.splitlines()
+        self.regions = sorted(regions, key=lambda r: r[1])
+        self.language = language
+
+    @property
+    def is_whole_file(self):
+        return len(self.regions) == 1 and self.regions[0][1] == 1 and self.regions[0][2] >= len(self.lines)
+
+    @property
+    def text(self):
+        if self.is_whole_file:
+            return self.source
+        prefix = COMMENT_PREFIX.get(self.language, "//")
+        parts = []
+        for _, start, end in self.regions:
+            parts.append(f"{prefix} --- lines {start}-{end} ---")
+            parts.extend(self.lines[start - 1:end])
+        return "\n".join(parts)
+
+    def describe(self):
+        if self.is_whole_file:
+            return f"whole file ({len(self.lines)} lines)"
+        sent = sum(end - start + 1 for _, start, end in self.regions)
+        names = ", ".join(name for name, _, _ in self.regions)
+        return f"{sent} of {len(self.lines)} lines ({names})"
+
+    def merge(self, fixed_code):
+        """Splices the model's fixed regions back into the full file; None when they cannot be mapped.
+
+        The result ends with a newline when the source does, so an unchanged end of file shows no diff.
+        """
+        if not fixed_code or fixed_code == "Not Found":
+            return None
+        eof = "\n" if self.source.endswith("\n") else ""
+        if self.is_whole_file:
+            return fixed_code.rstrip("\n") + eof
+
+        replacements = {}
+        current = None
+        for line in fixed_code.splitlines():
+            marker = MARKER_RE.match(line)
+            if marker:
+                current = (int(marker.group(1)), int(marker.group(2)))
+                replacements[current] = []
+            elif current is not None:
+                replacements[current].append(line)
+        spans = {(start, end) for _, start, end in self.regions}
+        if not replacements and len(self.regions) == 1:
+            replacements = {(self.regions[0][1], self.regions[0][2]): fixed_code.splitlines()}
+        if not replacements or not set(replacements) <= spans:
+            return None
+
+        merged = list(self.lines)
+        for (start, end), new_lines in sorted(replacements.items(), reverse=True):
+            merged[start - 1:end] = new_lines
+        return "\n".join(merged) + eof
+
+
+def _windows(lines, hits):
+    """Line windows around hit lines, merged where they overlap."""
+    regions = []
+    for line in sorted(hits):
+        start, end = max(1, line - WINDOW_LINES), min(len(lines), line + WINDOW_LINES)
+        if regions and start <= regions[-1][2] + 1:
+            regions[-1] = ("window", regions[-1][1], max(end, regions[-1][2]))
+        else:
+            regions.append(("window", start, end))
+    return regions
+
+
+def slice_context(source, language, issue_body, file_path=None, budget=CONTEXT_TOKENS):
+    """Selects the functions/classes relevant to the issue within ``budget`` tokens.
+
+    Files that already fit are sent whole. Otherwise units are ranked by stack-trace line hits,
+    by name mentions and by identifier overlap with the issue; unparseable files fall back to
+    line windows around the same signals.
+    """
+    lines = source.splitlines()
+    if estimate_tokens(source) <= budget or not lines:
+        return CodeContext(source, [("file", 1, max(1, len(lines)))], language)
+
+    mentioned = set(IDENTIFIER_RE.findall(issue_body or ""))
+    trace_lines = stack_lines(issue_body, file_path)
+    units = find_units(source, language)
+
+    def cost(start, end):
+        return estimate_tokens("\n".join(lines[start - 1:end]))
+
+    selected = []
+    if units:
+        scored = []
+        for name, start, end in units:
+            body = set(IDENTIFIER_RE.findall("\n".join(lines[start - 1:end])))
+            score = 10 * sum(start <= n <= end for n in trace_lines)
+            score += 5 * (name in mentioned) + min(len(body & mentioned), 10)
+            if score:
+                scored.append((score, start, name, end))
+        used = 0
+        for score, start, name, end in sorted(scored, key=lambda s: (-s[0], s[1])):
+            overlaps = any(start <= e and s <= end for _, s, e in selected)
+            if not overlaps and used + cost(start, end) <= budget:
+                selected.append((name, start, end))
+                used += cost(start, end)
+        if selected:
+            # Imports and module-level definitions help the model, if they still fit
+            first = min(start for _, start, _ in units)
+            header_end = min(first - 1, HEADER_LINES)
+            if header_end >= 1 and used + cost(1, header_end) <= budget:
+                selected.append(("header", 1, header_end))
+
+    if not selected:
+        hits = set(trace_lines)
+        if not hits:
+            hits = {i for i, line in enumerate(lines, start=1) if mentioned & set(IDENTIFIER_RE.findall(line))}
+        used = 0
+        for region in _windows(lines, hits):
+            if used + cost(region[1], region[2]) <= budget:
+                selected.append(region)
+                used += cost(region[1], region[2])
+
+    if not selected:
+        # Nothing points anywhere: send as much of the top of the file as fits
+        end, chars = 1, len(lines[0])
+        while end < len(lines) and estimate_tokens("x" * (chars + len(lines[end]) + 1)) <= budget:
+            chars += len(lines[end]) + 1
+            end += 1
+        selected = [("head", 1, end)]
+    return CodeContext(source, selected, language)
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+CACHE_DIR = os.getenv("CODEDOC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "codedoc"))
+
+
+class DiskCache:
+    """Persistent key/value cache: one JSON file per key, evicted least-recently-used past ``max_bytes``."""
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        entry = dict(entry, stored_at=time.time())
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)  # an overwritten entry frees its old size
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)  # atomic, so concurrent readers never see a partial file
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            entries, total = self._scan()
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    pass
+            self._size = total
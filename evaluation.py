@@ -0,0 +1,126 @@
+import os
+import json
+import time
+from difflib import ndiff
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from metrics import levenshtein_ratio
+from patching import try_apply
+
+REQUIRED_KEYS = ["old", "hunk", "comment", "new"]
+EVAL_CONCURRENCY = int(os.getenv("CODEDOC_EVAL_CONCURRENCY", "8"))
+SCORE_WORKERS = int(os.getenv("CODEDOC_SCORE_WORKERS", str(os.cpu_count() or 2)))
+
+
+def compute_similarity(predicted, actual):
+    a = predicted.strip().replace(" ", "").replace("\n", "")
+    b = actual.strip().replace(" ", "").replace("\n", "")
+    return levenshtein_ratio(a, b)
+
+def get_diff(old, new):
+    return "\n".join(ndiff(old.splitlines(), new.splitlines()))
+
+def clean_prediction(pred):
+    lines = pred.strip().split("\n")
+    return "\n".join([l for l in lines if l and not l.startswith("//") and "```" not in l and "**" not in l])
+
+
+def iter_jsonl(lines):
+    """Lazily yields (index, sample, error) from an iterable of JSONL lines (str or bytes)."""
+    index = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            sample = json.loads(line)
+        except ValueError as e:
+            yield index, None, f"invalid JSON ({e})"
+        else:
+            missing = [k for k in REQUIRED_KEYS if k not in sample]
+            yield index, sample, f"missing required keys {missing}" if missing else None
+        index += 1
+
+
+def score_prediction(response, target, source=None):
+    """CPU-bound scoring step; module-level so it can run in a worker process.
+
+    With ``source``, the response is a patch and is applied to it first; one that does not apply
+    scores as an empty prediction. Returns (cleaned, similarity, diff, seconds spent scoring, patch error).
+    """
+    start = time.perf_counter()
+    patch_error = None
+    if source is not None:
+        response, patch_error = try_apply(source, response)
+        response = response or ""
+    cleaned = clean_prediction(response)
+    similarity, diff = compute_similarity(cleaned, target), get_diff(target, cleaned)
+    return cleaned, similarity, diff, time.perf_counter() - start, patch_error
+
+
+def run_evaluation(samples, build_prompt, generate, concurrency=EVAL_CONCURRENCY, score_workers=SCORE_WORKERS,
+                   patch=False):
+    """Evaluates samples with concurrent LLM calls and process-pool scoring.
+
+    ``samples`` is an iterator of (index, sample, error) as produced by ``iter_jsonl``; it is
+    consumed lazily so only about ``2 * concurrency`` samples are in memory at once.
+    ``generate(prompt)`` returns (response, stats). With ``patch`` the responses are patches,
+    applied to each sample's old code before scoring. Yields one result dict per sample as it
+    completes, in completion order.
+    """
+    samples = iter(samples)
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as llm_pool, \
+            ProcessPoolExecutor(max_workers=max(1, score_workers)) as score_pool:
+        pending = {}
+
+        def refill():
+            nonlocal exhausted
+            while not exhausted and sum(1 for kind, _ in pending.values() if kind == "llm") < 2 * concurrency:
+                try:
+                    index, sample, error = next(samples)
+                except StopIteration:
+                    exhausted = True
+                    return
+                if error:
+                    pending[llm_pool.submit(lambda e=error: e)] = ("invalid", {"index": index})
+                    continue
+                prompt = build_prompt(sample["old"], sample["hunk"], sample["comment"])
+                item = {"index": index, "sample": sample, "prompt": prompt}
+                pending[llm_pool.submit(generate, prompt)] = ("llm", item)
+
+        refill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, item = pending.pop(future)
+                if kind == "invalid":
+                    yield {"index": item["index"], "error": future.result()}
+                elif kind == "llm":
+                    try:
+                        response, stats = future.result()
+                    except Exception as e:
+                        response, stats = f"[ERROR] {e}", None
+                    if response.startswith("[ERROR]"):
+                        yield {"index": item["index"], "error": response}
+                        continue
+                    item["stats"] = stats
+                    source = item["sample"]["old"] if patch else None
+                    pending[score_pool.submit(score_prediction, response, item["sample"]["new"], source)] = ("score", item)
+                else:
+                    cleaned, similarity, diff, score_seconds, patch_error = future.result()
+                    sample = item["sample"]
+                    yield {
+                        "index": item["index"],
+                        "error": None,
+                        "prompt": item["prompt"],
+                        "comment": sample["comment"],
+                        "target": sample["new"],
+                        "prediction": cleaned,
+                        "similarity": similarity,
+                        "diff": diff,
+                        "stats": item["stats"],
+                        "score_seconds": score_seconds,
+                        "patch_error": patch_error,
+                    }
+            refill()
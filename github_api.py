@@ -0,0 +1,125 @@
+import os
+import time
+import hashlib
+import threading
+import requests
+from http_client import get_session
+from disk_cache import CACHE_DIR, DiskCache
+from scheduler import get_scheduler
+import telemetry
+
+GITHUB_API = os.getenv("CODEDOC_GITHUB_API_URL", "https://api.github.com").rstrip("/")
+CACHE_MAX_BYTES = int(os.getenv("CODEDOC_GITHUB_CACHE_MB", "256")) * 1024 * 1024
+
+
+class GitHubError(RuntimeError):
+    """A GitHub API request that did not return 200."""
+
+    def __init__(self, status, data):
+        message = data.get("message") if isinstance(data, dict) else None
+        super().__init__(f"GitHub API error {status}: {message or data}")
+        self.status = status
+        self.data = data
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the shared on-disk GitHub response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(os.path.join(CACHE_DIR, "github"), CACHE_MAX_BYTES)
+        return _cache
+
+
+def github_get(url, token, params=None):
+    """Conditional GET against the GitHub API.
+
+    Sends ``If-None-Match``/``If-Modified-Since`` from the cached copy, so unchanged data comes
+    back as a 304 that does not count against the rate limit. Cached copies are kept per token, so
+    one token never sees data fetched with another. Returns (status, data, next_url).
+    """
+    cache = get_cache()
+    if params:
+        url = requests.Request("GET", url, params=params).prepare().url
+    key = hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16] + " " + url
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github+json"}
+    cached = cache.get(key)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_scheduler().send("github", None, lambda: get_session().get(url, headers=headers))
+    if response.status_code == 304 and cached:
+        telemetry.count("cache_hits")
+        return 200, cached["data"], cached.get("next")
+
+    try:
+        data = response.json()
+    except ValueError:
+        data = {"message": response.text}
+    next_url = response.links.get("next", {}).get("url")
+    if response.status_code == 200:
+        cache.set(key, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "next": next_url,
+            "data": data,
+            "fetched_at": time.time(),
+        })
+    return response.status_code, data, next_url
+
+
+def github_get_all(url, token, params=None):
+    """Follows ``Link: rel="next"`` pagination and returns the concatenated list of items.
+
+    Raises GitHubError if any page fails, rather than returning the pages fetched before it.
+    """
+    items = []
+    status, data, next_url = github_get(url, token, params)
+    while True:
+        if status != 200 or not isinstance(data, list):
+            raise GitHubError(status, data)
+        items.extend(data)
+        if not next_url:
+            return items
+        status, data, next_url = github_get(next_url, token)
+
+
+def fetch_github_issues(owner, repo, token):
+    """Fetches every open issue, across all result pages; raises GitHubError if a page fails."""
+    return github_get_all(
+        f"{GITHUB_API}/repos/{owner}/{repo}/issues", token, {"state": "open", "per_page": 100}
+    )
+
+
+def fetch_tree(owner, repo, tree_ish, token, recursive=True):
+    """Fetches a git tree (by branch, commit or tree SHA), revalidated against the on-disk cache.
+
+    GitHub truncates recursive listings of very large trees and sets ``truncated``; see
+    repo_tree.load_repo_tree for the loader that fills in the rest.
+    """
+    status, data, _ = github_get(
+        f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{tree_ish}", token, {"recursive": 1} if recursive else None
+    )
+    if status != 200:
+        print("Error:", status, data)
+        return {}
+    return data
+
+
+def fetch_repo_tree(owner, repo, branch, token):
+    """Fetches the recursive git tree for a branch (possibly ``truncated``)."""
+    return fetch_tree(owner, repo, branch, token)
+
+
+def fetch_contents(owner, repo, file_path, branch, token):
+    """Fetches the contents API payload for a single path. Returns (status, data)."""
+    status, data, _ = github_get(
+        f"{GITHUB_API}/repos/{owner}/{repo}/contents/{file_path}", token, {"ref": branch}
+    )
+    return status, data
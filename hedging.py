@@ -0,0 +1,125 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from telemetry import percentile
+
+# Seconds to wait on a model before also asking the next candidate (0 races all of them at once)
+HEDGE_AFTER = float(os.getenv("CODEDOC_HEDGE_AFTER", "10"))
+OUTCOMES = ("win", "rejected", "error", "cancelled")
+
+
+class Cancelled(Exception):
+    """Raised inside an attempt once another candidate has already won."""
+
+
+class HedgeStats:
+    """Per-model outcomes and latencies of hedged requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def record(self, model, outcome, seconds=None):
+        with self._lock:
+            entry = self._models.setdefault(model, {"latencies": [], **{o: 0 for o in OUTCOMES}})
+            entry[outcome] += 1
+            if seconds is not None and outcome in ("win", "rejected"):
+                entry["latencies"].append(seconds)
+
+    def summary(self):
+        """One row per model: attempts, win rate and latency percentiles of completed responses."""
+        rows = []
+        with self._lock:
+            models = {m: dict(e, latencies=sorted(e["latencies"])) for m, e in self._models.items()}
+        for model, entry in models.items():
+            launched = sum(entry[o] for o in OUTCOMES)
+            latencies = entry["latencies"]
+            rows.append({
+                "Model": model,
+                "Attempts": launched,
+                "Wins": entry["win"],
+                "Win rate": round(entry["win"] / launched, 2) if launched else 0.0,
+                "Rejected": entry["rejected"],
+                "Errors": entry["error"],
+                "Cancelled": entry["cancelled"],
+                "p50 (s)": round(percentile(latencies, 0.5), 3),
+                "p95 (s)": round(percentile(latencies, 0.95), 3),
+            })
+        return rows
+
+
+def hedge(candidates, attempt, accept, delay=HEDGE_AFTER, initializer=None, stats=None):
+    """Runs ``attempt(model, cancel)`` for the first candidate, adding the next one every ``delay``
+    seconds without an accepted answer, or at once when an attempt fails or ``accept`` rejects it.
+
+    Returns (model, value) for the first accepted value and sets ``cancel`` (a threading.Event)
+    so the others can stop; attempts already in flight are abandoned, not waited for. If nothing
+    is accepted, returns the earliest candidate's rejected value, or raises the last error.
+    """
+    stats = stats if stats is not None else get_hedge_stats()
+    cancel = threading.Event()
+    finished = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=len(candidates), initializer=initializer)
+    pending = set()
+
+    def run(model):
+        start = time.perf_counter()
+        try:
+            if cancel.is_set():
+                raise Cancelled()
+            finished.put((model, attempt(model, cancel), None, time.perf_counter() - start))
+        except Exception as e:
+            finished.put((model, None, e, time.perf_counter() - start))
+
+    def launch():
+        model = candidates[len(pending) + len(done)]
+        pending.add(model)
+        executor.submit(run, model)
+
+    done, rejected, error = [], {}, None
+    try:
+        launch()
+        while delay <= 0 and len(pending) + len(done) < len(candidates):
+            launch()
+        while pending:
+            more = len(pending) + len(done) < len(candidates)
+            try:
+                model, value, e, seconds = finished.get(timeout=delay if more else None)
+            except queue.Empty:
+                launch()
+                continue
+            pending.discard(model)
+            done.append(model)
+            if e is None and accept(value):
+                stats.record(model, "win", seconds)
+                return model, value
+            stats.record(model, "rejected" if e is None else "error", seconds)
+            if e is None:
+                rejected[model] = value
+            else:
+                error = e
+            if more:
+                launch()
+    finally:
+        cancel.set()
+        for model in pending:
+            stats.record(model, "cancelled")
+        executor.shutdown(wait=False)
+    for model in candidates:
+        if model in rejected:
+            return model, rejected[model]
+    raise error
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+def get_hedge_stats():
+    """Returns the process-wide hedge statistics."""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = HedgeStats()
+        return _stats
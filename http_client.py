@@ -0,0 +1,92 @@
+import os
+import json
+import threading
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from scheduler import get_scheduler
+
+CONNECT_TIMEOUT = float(os.getenv("CODEDOC_HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("CODEDOC_HTTP_READ_TIMEOUT", "120"))
+POOL_SIZE = int(os.getenv("CODEDOC_HTTP_POOL_SIZE", "32"))
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+def host_pool_sizes(spec=None):
+    """Parses ``CODEDOC_HTTP_HOST_POOLS``, e.g. ``"api.github.com=16,api.groq.com=64"``."""
+    spec = os.getenv("CODEDOC_HTTP_HOST_POOLS", "") if spec is None else spec
+    sizes = {}
+    for item in spec.split(","):
+        host, _, size = item.strip().partition("=")
+        if host and size.isdigit():
+            sizes[host] = int(size)
+    return sizes
+
+
+class PooledSession(requests.Session):
+    """Keep-alive session shared by all threads.
+
+    Connection pools are urllib3's (thread-safe). Cookies are refused so no per-request state
+    is shared, and every request gets a default (connect, read) timeout.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, host_pools=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        super().__init__()
+        self.timeout = timeout
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        for prefix in ("https://", "http://"):
+            self.mount(prefix, HTTPAdapter(pool_connections=16, pool_maxsize=pool_size))
+        for host, size in (host_pools or {}).items():
+            self.mount(f"https://{host}", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+_session = None
+_groq_clients = {}
+_lock = threading.Lock()
+
+def get_session():
+    """Returns the process-wide pooled session used for all GitHub and raw Groq HTTP calls."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = PooledSession(host_pools=host_pool_sizes())
+        return _session
+
+
+def _observe_groq(response):
+    """httpx response hook: rate-limit headers of every Groq response go to that model's bucket."""
+    try:
+        model = json.loads(response.request.content or b"{}").get("model")
+    except (ValueError, AttributeError):
+        model = None
+    get_scheduler().observe("groq", model, response.headers)
+
+
+def get_groq_client(api_key):
+    """One Groq SDK client per API key for the whole process, so reruns reuse its connections.
+
+    The SDK runs on httpx, which speaks HTTP/2 when the ``h2`` package is installed. Retries are
+    left to the shared scheduler, which also sees the rate-limit headers of every response.
+    """
+    import httpx
+    from groq import Groq
+
+    with _lock:
+        if api_key not in _groq_clients:
+            http_client = httpx.Client(
+                http2=HTTP2,
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                event_hooks={"response": [_observe_groq]},
+            )
+            _groq_clients[api_key] = Groq(api_key=api_key, max_retries=0, http_client=http_client)
+        return _groq_clients[api_key]
@@ -1,11 +1,20 @@
+import time
+SCRIPT_STARTED = time.perf_counter()
+
 import streamlit as st
-import json
 import os
+from functools import partial
 from dotenv import load_dotenv
-from difflib import SequenceMatcher, ndiff
-import pandas as pd
-from groq import Groq
+from http_client import get_groq_client
+from llm_cache import cached_completion, get_llm_cache
+import streaming
+import token_budget
+import patching
+import telemetry
+from scheduler import get_scheduler
+from evaluation import EVAL_CONCURRENCY, iter_jsonl, run_evaluation
 
+IMPORT_SECONDS = time.perf_counter() - SCRIPT_STARTED
 
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -13,8 +22,6 @@ if not GROQ_API_KEY:
     st.error("❌ Please set GROQ_API_KEY in your .env file.")
     st.stop()
 
-groq_client = Groq(api_key=GROQ_API_KEY)
-
 st.set_page_config(page_title="Code-Doctor Debug", layout="wide")
 st.title("🔍 Code-Doctor: Evaluation")
 st.caption("Debugging your code")
@@ -23,28 +30,25 @@ st.caption("Debugging your code")
 model_options = {
     "LLaMA 3.3 70B": "llama-3.3-70b-versatile",
     "Gemma2 9B IT": "gemma2-9b-it",
-    "LLaMA 3 8B 8192": "llama3-8b-8192"
+    "LLaMA 3 8B 8192": "llama3-8b-8192",
+    "Auto: cheapest model that fits": "auto",
 }
 selected_label = st.selectbox("Choose the Model of choice or Evaluation", list(model_options.keys()))
 selected_model = model_options[selected_label]
 
 
-uploaded_file = st.file_uploader("📁 Upload a ⁠ .jsonl ⁠ file", type=["jsonl"])
+stream_responses = st.checkbox("📡 Stream responses (records time-to-first-token)", value=True)
+concurrency = st.slider("⚡ Concurrent LLM requests", min_value=1, max_value=64, value=EVAL_CONCURRENCY)
+patch_mode = st.checkbox("🩹 Ask for patches instead of the whole code (applied locally before scoring)", value=False)
 
+uploaded_file = st.file_uploader("📁 Upload a ⁠ .jsonl ⁠ file", type=["jsonl"])
 
-def compute_similarity(predicted, actual):
-    a = predicted.strip().replace(" ", "").replace("\n", "")
-    b = actual.strip().replace(" ", "").replace("\n", "")
-    return SequenceMatcher(None, a, b).ratio()
 
-def get_diff(old, new):
-    return "\n".join(ndiff(old.splitlines(), new.splitlines()))
+WHOLE_CODE_FORMAT = "Respond with ONLY the updated code:"
 
-def clean_prediction(pred):
-    lines = pred.strip().split("\n")
-    return "\n".join([l for l in lines if l and not l.startswith("//") and "```" not in l and "**" not in l])
 
-def build_prompt(old_code, diff, comment):
+def build_prompt(old_code, diff, comment, output_format=WHOLE_CODE_FORMAT):
+    """The fix prompt; ``output_format`` asks for the whole code or, with patching.PATCH_INSTRUCTIONS, a patch."""
     return f"""You are an elite AI trained to fix buggy code using reviewer comments and diffs.
 
 Revise the original code based ONLY on the diff and comment. Apply minimal edits. Do not explain.
@@ -58,72 +62,173 @@ Diff:
 Comment:
 {comment}
 
-Respond with ONLY the updated code:
+{output_format}
 """
 
-def generate_fix(prompt, model_name):
+def generate_fix(prompt, model_name, on_text=None, stats=None):
+    messages = [{"role": "user", "content": prompt}]
+    groq_client = get_groq_client(GROQ_API_KEY)
+    if stats is None:
+        stats = streaming.new_stats(model_name)
     try:
-        return groq_client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}]
-        ).choices[0].message.content.strip()
+        # The updated code is about as long as the original; oversized prompts fail here, before a round-trip
+        candidates = [m for m in model_options.values() if m != "auto"] if model_name == "auto" else [model_name]
+        expected = patching.PATCH_TOKENS // 2 if patch_mode else token_budget.count_tokens(prompt, candidates[0]) // 2 + 64
+        model_name, _ = token_budget.route(messages, candidates, expected)
+        stats["model"] = model_name
+        if on_text is not None:
+            call = lambda: streaming.stream_groq(groq_client, model_name, messages, on_text, stats)
+        else:
+            call = lambda: streaming.timed_call(
+                lambda: groq_client.chat.completions.create(
+                    model=model_name,
+                    messages=messages
+                ).choices[0].message.content,
+                stats,
+            )
+        response = cached_completion(
+            model_name, messages, lambda: get_scheduler().call("groq", model_name, call)
+        ).strip()
+        streaming.settle_stats(stats)
+        return response
     except Exception as e:
         return f"[ERROR] {e}"
 
-if uploaded_file and st.button("Run Debugging"):
-    dataset = [json.loads(line) for line in uploaded_file.readlines()][:300]
-    results = []
-    scores = []
+DETAIL_LIMIT = 25
+TABLE_REFRESH_SECONDS = 1.0
 
-    for i, sample in enumerate(dataset):
-        required = ["old", "hunk", "comment", "new"]
-        if not all(k in sample for k in required):
-            st.error(f"Sample {i+1} missing required keys.")
-            continue
 
-        old = sample["old"]
-        diff = sample["hunk"]
-        comment = sample["comment"]
-        target = sample["new"]
+def generate_with_stats(prompt):
+    """Worker-thread entry point: returns (response, stats) for one prompt."""
+    stats = streaming.new_stats(selected_model)
+    on_text = (lambda text: None) if stream_responses else None
+    with telemetry.activate(run), telemetry.stage("llm"):
+        response = generate_fix(prompt, selected_model, on_text, stats)
+        telemetry.note_llm(stats)
+        if response.startswith("[ERROR]"):
+            telemetry.note(error=response)
+    return response, stats
 
-        prompt = build_prompt(old, diff, comment)
-        if len(prompt.split()) > 1500:
-            st.warning(f"Sample {i+1}: Prompt too long for {selected_model} (tokens={len(prompt.split())})")
 
-        response = generate_fix(prompt, selected_model)
-        if response.startswith("[ERROR]"):
-            st.error(f"Sample {i+1}: {response}")
+def counting_lines(upload, counter):
+    """Yields the upload's lines lazily while counting bytes read, for the progress bar."""
+    for line in upload:
+        counter[0] += len(line)
+        yield line
+
+
+def render_evaluation(last_run):
+    """Final table, downloads, lowest-scoring samples and timing panel of a finished run."""
+    import pandas as pd
+    results, details = last_run["results"], last_run["details"]
+    if results:
+        df = pd.DataFrame(results).sort_values("Sample #")
+        avg = round(df["Similarity (%)"].mean(), 2)
+        st.metric("Average Similarity", f"{avg}%")
+        tokens = df["Output Tokens"].dropna()
+        if len(tokens):
+            st.caption(f"✍️ {tokens.mean():.0f} output tokens per sample on average")
+        if "Patch Applied" in df:
+            st.caption(f"🩹 {int((~df['Patch Applied']).sum())} of {len(df)} patches did not apply")
+        st.caption(last_run["cache_summary"])
+        st.dataframe(df)
+        st.download_button("📥 Download Results", df.to_csv(index=False).encode(), file_name="debug_results.csv")
+
+        by_index = {r["Sample #"] - 1: r for r in results}
+        st.subheader(f"🔬 Lowest-scoring {len(details)} samples")
+        for sim, i, prompt, diff, stats in details:
+            with st.expander(f"Sample {i+1} (Sim: {round(sim*100,2)}%)"):
+                st.caption(streaming.format_stats(stats))
+                st.markdown("*Prompt:*")
+                st.code(prompt)
+                st.markdown("*Prediction:*")
+                st.code(by_index[i]["Prediction"])
+                st.markdown("*Target:*")
+                st.code(by_index[i]["Target"])
+                st.markdown("*Diff:*")
+                st.code(diff, language="diff")
+
+    run = last_run["run"]
+    jsonl_path, prom_path = last_run["exports"]
+    with st.expander("📈 Pipeline timings"):
+        st.table(run.summary())
+        st.caption(f"Exported to `{jsonl_path}` and `{prom_path}`")
+        st.download_button("⬇️ Download timings (JSONL)", run.to_jsonl(), file_name=f"codedoc-{run.run_id}.jsonl")
+
+
+# Kept in session state so widget changes and downloads re-render the last run instead of clearing it
+run_requested = uploaded_file and st.button("Run Debugging")
+last_run = st.session_state.get("eval_run")
+if not run_requested and uploaded_file and last_run and last_run["key"] == (uploaded_file.name, selected_model, patch_mode):
+    render_evaluation(last_run)
+
+if run_requested:
+    import pandas as pd
+    run = telemetry.Run("inference")
+    results = []
+    details = []
+    errors = 0
+    consumed = [0]
+    total_bytes = max(1, uploaded_file.size)
+
+    progress = st.progress(0.0)
+    status = st.empty()
+    table = st.empty()
+    last_refresh = 0.0
+
+    samples = iter_jsonl(counting_lines(uploaded_file, consumed))
+    prompt_builder = partial(build_prompt, output_format=patching.PATCH_INSTRUCTIONS) if patch_mode else build_prompt
+    for result in run_evaluation(samples, prompt_builder, generate_with_stats, concurrency, patch=patch_mode):
+        i = result["index"]
+        if result["error"]:
+            errors += 1
+            st.error(f"Sample {i+1}: {result['error']}")
             continue
 
-        cleaned = clean_prediction(response)
-        sim = compute_similarity(cleaned, target)
-        scores.append(sim)
+        run.add({"stage": "scoring", "item": i, "seconds": result["score_seconds"]})
+        prompt = result["prompt"]
 
+        sim = result["similarity"]
+        stats = result["stats"] or {}
         results.append({
             "Sample #": i + 1,
             "Similarity (%)": round(sim * 100, 2),
-            "Comment": comment,
-            "Prediction": cleaned,
-            "Target": target,
-            "Prompt Tokens": len(prompt.split())
+            "Comment": result["comment"],
+            "Prediction": result["prediction"],
+            "Target": result["target"],
+            "Model": stats.get("model"),
+            "Prompt Tokens": token_budget.count_tokens(prompt, stats.get("model")),
+            "TTFT (s)": stats.get("ttft"),
+            "Latency (s)": stats.get("duration"),
+            "Output Tokens": stats.get("completion_tokens"),
+            "Tokens/s": stats.get("tokens_per_sec"),
+            "Cached": stats.get("cached"),
         })
-
-        with st.expander(f"Sample {i+1} (Sim: {round(sim*100,2)}%)"):
-            st.markdown("*Prompt:*")
-            st.code(prompt)
-            st.markdown("*Prediction:*")
-            st.code(cleaned)
-            st.markdown("*Target:*")
-            st.code(target)
-            st.markdown("*Diff:*")
-            st.code(get_diff(target, cleaned), language="diff")
-
-    if scores:
-        avg = round(sum(scores) / len(scores) * 100, 2)
-        st.metric("Average Similarity", f"{avg}%")
-        df = pd.DataFrame(results)
-        st.dataframe(df)
-        st.download_button("📥 Download Results", df.to_csv(index=False).encode(), file_name="debug_results.csv")
+        if patch_mode:
+            results[-1]["Patch Applied"] = result["patch_error"] is None
+        # Keep full prompts/diffs only for the lowest-scoring samples shown at the end
+        details.append((sim, i, prompt, result["diff"], stats))
+        details = sorted(details)[:DETAIL_LIMIT]
+
+        progress.progress(min(1.0, consumed[0] / total_bytes))
+        avg = sum(r["Similarity (%)"] for r in results) / len(results)
+        status.markdown(f"✅ {len(results)} scored · ❌ {errors} failed · running average {avg:.2f}%")
+        if time.monotonic() - last_refresh >= TABLE_REFRESH_SECONDS:
+            last_refresh = time.monotonic()
+            with telemetry.activate(run), telemetry.stage("render"):
+                table.dataframe(pd.DataFrame(results[-200:]))
+    progress.progress(1.0)
+    table.empty()
+    st.session_state["eval_run"] = {
+        "key": (uploaded_file.name, selected_model, patch_mode),
+        "results": results,
+        "details": details,
+        "cache_summary": get_llm_cache().summary(),
+        "run": run,
+        "exports": run.export(),
+    }
+    render_evaluation(st.session_state["eval_run"])
 
 
 st.markdown("**🚀 Built with ❤️ by Ankan Moh, Hanvik S and Sanjay Maj.**")
+st.caption(f"⏱️ Script run {(time.perf_counter() - SCRIPT_STARTED) * 1000:.0f} ms (imports {IMPORT_SECONDS * 1000:.0f} ms)")
@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+import threading
+from disk_cache import CACHE_DIR, DiskCache
+import telemetry
+
+# "on": read and write the cache, "off": always call the API, "replay": serve only from the cache
+LLM_CACHE_MODE = os.getenv("CODEDOC_LLM_CACHE", "on").lower()
+LLM_CACHE_MAX_BYTES = int(os.getenv("CODEDOC_LLM_CACHE_MB", "512")) * 1024 * 1024
+LLM_CACHE_TTL = float(os.getenv("CODEDOC_LLM_CACHE_TTL_HOURS", "0")) * 3600 or None
+
+
+class ReplayMiss(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class LLMCache:
+    """Content-addressed store of chat completions, keyed by model + messages + sampling parameters."""
+
+    def __init__(self, directory, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL, mode=LLM_CACHE_MODE):
+        self.store = DiskCache(directory, max_bytes, ttl)
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, messages, params):
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def complete(self, model, messages, call, refresh=False, **params):
+        """Returns the cached response text, or runs ``call()`` and records its result.
+
+        ``refresh`` skips the lookup (used for retries after an unusable answer) but still
+        stores the new response.
+        """
+        if self.mode == "off":
+            return call()
+        key = self.key(model, messages, params)
+        if not refresh:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._count("hits")
+                telemetry.count("cache_hits")
+                return entry["response"]
+        self._count("misses")
+        if self.mode == "replay":
+            raise ReplayMiss(f"No recorded response for {model} (key {key[:12]}) in replay mode.")
+        response = call()
+        self.store.set(key, {"model": model, "response": response})
+        self._count("stores")
+        return response
+
+    def summary(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / total * 100 if total else 0.0
+        return f"LLM cache ({self.mode}): {self.stats['hits']} hits, {self.stats['misses']} misses ({rate:.0f}% hit rate)"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Returns the process-wide LLM response cache shared by all three apps."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(os.path.join(CACHE_DIR, "llm"))
+        return _cache
+
+
+def cached_completion(model, messages, call, refresh=False, **params):
+    """Shortcut for ``get_llm_cache().complete(...)``."""
+    return get_llm_cache().complete(model, messages, call, refresh=refresh, **params)
@@ -1,13 +1,32 @@
+import time
+SCRIPT_STARTED = time.perf_counter()  # before the other imports, so the rerun caption can report their cost
+
 import streamlit as st
-import requests
 import base64
 import os
 import re
 from dotenv import load_dotenv
-from groq import Groq
-from fpdf import FPDF
-from functools import lru_cache
-import difflib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import threading
+import itertools
+import github_api
+from http_client import get_groq_client
+import path_index as path_index_module
+import repo_tree
+from llm_cache import cached_completion, get_llm_cache
+import snapshot as snapshot_module
+from context_slicer import CONTEXT_TOKENS, CodeContext, slice_context
+import token_budget
+import path_batch
+import hedging
+import patching
+from results_store import get_results_store
+import streaming
+import telemetry
+from scheduler import get_scheduler
+
+IMPORT_SECONDS = time.perf_counter() - SCRIPT_STARTED
 
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_PAT")
@@ -24,97 +43,146 @@ if not ANOTHER_LLM_API_KEY:
     st.error("❌ Another LLM API Key not found. Set 'ANOTHER_LLM_API_KEY' in your .env' file.")
     st.stop()
 
-client = Groq(api_key=GROQ_API_KEY)
-llm_client = Groq(api_key=ANOTHER_LLM_API_KEY) 
+# Re-asks when the response has no parseable Fixed Code block
+FIX_RETRIES = int(os.getenv("CODEDOC_FIX_RETRIES", "1"))
+
+# Candidate models for fixes: each request goes to the cheapest one whose context window and tier fit
+FIX_MODELS = [m.strip() for m in os.getenv("CODEDOC_FIX_MODELS", "llama-3.3-70b-versatile").split(",") if m.strip()]
+FIX_MIN_TIER = int(os.getenv("CODEDOC_FIX_MIN_TIER", "1"))
+# Backup models raced against the routed one (see hedging.HEDGE_AFTER); empty disables hedging
+HEDGE_MODELS = [m.strip() for m in os.getenv("CODEDOC_HEDGE_MODELS", "").split(",") if m.strip()]
+FIX_ANSWER_TOKENS = 400  # root cause and explanation, on top of the code itself
+# "code": the model returns the whole fixed code; "patch": only search/replace blocks, applied locally
+PATCH_MODE = os.getenv("CODEDOC_FIX_FORMAT", "code") == "patch"
+MIN_CONTEXT_TOKENS = 500
+
+# Runs with at least this many issues download the branch once instead of per-file API calls
+SNAPSHOT_MIN_ISSUES = int(os.getenv("CODEDOC_SNAPSHOT_MIN_ISSUES", "2"))
 
+PATH_MODEL = "mixtral-8x7b-32768"
+EXTRACT = object()  # file_path placeholder: resolve the path inside the worker
 
-def extract_file_path(issue_body, repo_files):
+
+def extract_file_path(issue_body, path_index):
     """Extracts file path from GitHub issue body. Supports absolute URL or relative path."""
+    # Literal paths and blob URLs resolve straight from the index, without an LLM call
+    direct_match = path_index.match_text(issue_body)
+    if direct_match:
+        print(f"[⚡ Index Match] {direct_match}")
+        return direct_match
+
     try:
-        
-        response = llm_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an AI that extracts file paths from GitHub issue descriptions. "
-                        "Your task is to find and return the exact GitHub file path or relative file path mentioned. "
-                        "Return only the path part, like 'src/main.py' or 'test/CMakeLists.txt'. If none found, reply 'not there'."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": f"Extract file path (absolute or relative) from:\n\n{issue_body}"
-                }
-            ],
-            model="mixtral-8x7b-32768",
-        )
-        
-        extracted_text = response.choices[0].message.content.strip()
+        model = PATH_MODEL
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are an AI that extracts file paths from GitHub issue descriptions. "
+                    "Your task is to find and return the exact GitHub file path or relative file path mentioned. "
+                    "Return only the path part, like 'src/main.py' or 'test/CMakeLists.txt'. If none found, reply 'not there'."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Extract file path (absolute or relative) from:\n\n{issue_body}"
+            }
+        ]
+        extracted_text = cached_completion(
+            model, messages,
+            lambda: get_scheduler().call("groq", model, lambda: get_groq_client(ANOTHER_LLM_API_KEY).chat.completions.create(
+                messages=messages, model=model
+            ).choices[0].message.content),
+        ).strip()
         print(f"[LLM Output] {extracted_text}")
+        return resolve_extracted_path(extracted_text, path_index)
 
-        if not extracted_text or not repo_files:
-            return None
+    except Exception as e:
+        print(f"[❌ Exception] {e}")
+        return None
 
-        github_url_match = re.search(
-            r"https://github\.com/[^/]+/[^/]+/blob/[^/]+/([^\s`'\"#)>\]]+)", extracted_text
-        )
-        if github_url_match:
-            file_path = github_url_match.group(1).strip()
-            normalized_file_path = file_path.lower().strip()
-            normalized_repo_files = [f.lower().strip() for f in repo_files]
-
-            if normalized_file_path in normalized_repo_files:
-                print(f"[✅ Absolute Path Match] {file_path}")
-                return file_path
-
-            
-            close_matches = difflib.get_close_matches(
-                normalized_file_path, normalized_repo_files, n=1, cutoff=0.6
-            )
-            if close_matches:
-                best_match_index = normalized_repo_files.index(close_matches[0])
-                print(f"[🔍 Fuzzy Absolute Match] {repo_files[best_match_index]}")
-                return repo_files[best_match_index]
-
-       
-        relative_path_candidate = extracted_text.strip()
-        normalized_candidate = relative_path_candidate.lower()
-        normalized_repo_files = [f.lower().strip() for f in repo_files]
-
-        if normalized_candidate in normalized_repo_files:
-            print(f"[✅ Relative Path Match] {relative_path_candidate}")
-            return relative_path_candidate
-
-        close_matches = difflib.get_close_matches(
-            normalized_candidate, normalized_repo_files, n=1, cutoff=0.6
-        )
-        if close_matches:
-            best_match_index = normalized_repo_files.index(close_matches[0])
-            print(f"[🔍 Fuzzy Relative Match] {repo_files[best_match_index]}")
-            return repo_files[best_match_index]
 
-        print(f"[❌ No Match] '{relative_path_candidate}' not found in repo.")
+def resolve_extracted_path(extracted_text, path_index):
+    """Maps a model's answer (blob URL or path) onto a file that exists in the repo."""
+    if not extracted_text or not len(path_index):
         return None
 
-    except Exception as e:
-        print(f"[❌ Exception] {e}")
-        return None
+    github_url_match = path_index_module.BLOB_URL_RE.search(extracted_text)
+    if github_url_match:
+        matches = path_index.lookup(github_url_match.group(1), n=1)
+        if matches:
+            print(f"[✅ Absolute Path Match ({matches[0][2]})] {matches[0][0]}")
+            return matches[0][0]
 
+    relative_path_candidate = extracted_text.strip()
+    matches = path_index.lookup(relative_path_candidate, n=1)
+    if matches:
+        print(f"[✅ Relative Path Match ({matches[0][2]})] {matches[0][0]}")
+        return matches[0][0]
 
+    print(f"[❌ No Match] '{relative_path_candidate}' not found in repo.")
+    return None
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_PAT")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GITHUB_TOKEN:
-    st.error("❌ GitHub API Token not found. Set 'GITHUB_PAT' in your .env' file.")
-    st.stop()
-if not GROQ_API_KEY:
-    st.error("❌ Groq API Key not found. Set 'GROQ_API_KEY' in your .env' file.")
-    st.stop()
+def extract_batch(batch, path_index, run=None):
+    """One JSON-mode request for a batch of (idx, body) pairs. Returns {idx: path or None} for settled items."""
+    messages = path_batch.batch_messages(batch)
+    params = {"response_format": {"type": "json_object"}, "temperature": 0}
+    with telemetry.activate(run), telemetry.stage("path_batch", size=len(batch)):
+        text = cached_completion(
+            PATH_MODEL, messages,
+            lambda: get_scheduler().call("groq", PATH_MODEL, lambda: get_groq_client(ANOTHER_LLM_API_KEY).chat.completions.create(
+                messages=messages, model=PATH_MODEL, **params
+            ).choices[0].message.content),
+            **params,
+        )
+    settled = {}
+    for idx, answer in path_batch.parse_batch_response(text, [idx for idx, _ in batch]).items():
+        if answer is None:
+            settled[idx] = None
+        else:
+            path = resolve_extracted_path(answer, path_index)
+            if path:
+                settled[idx] = path  # answers that match no repo file are retried one by one
+    return settled
+
+
+def extract_file_paths(issues, path_index, max_workers, run=None):
+    """Resolves file paths for many (idx, issue) pairs with batched LLM calls.
+
+    Bodies that name a known file are resolved from the index. The rest are packed into
+    JSON-mode batches; any issue a batch fails to settle falls back to ``extract_file_path``.
+    """
+    paths, remaining = {}, []
+    for idx, issue in issues:
+        direct_match = path_index.match_text(issue["body"])
+        if direct_match:
+            paths[idx] = direct_match
+        else:
+            remaining.append((idx, issue["body"]))
+    bodies = dict(remaining)
+    batches = path_batch.pack_batches(remaining, PATH_MODEL)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = [executor.submit(extract_batch, batch, path_index, run) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                paths.update(future.result())
+            except Exception as e:
+                print(f"[❌ Batch Exception] {e}")
+        unsettled = [idx for idx in bodies if idx not in paths]
+        fallbacks = {executor.submit(extract_single, bodies[idx], path_index, run): idx for idx in unsettled}
+        for future in as_completed(fallbacks):
+            paths[fallbacks[future]] = future.result()
+    finally:
+        # A rerun or Stop interrupts the script here; queued batches are dropped rather than waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+    return paths
+
+
+def extract_single(issue_body, path_index, run=None):
+    with telemetry.activate(run), telemetry.stage("path_extraction", fallback=True):
+        return extract_file_path(issue_body, path_index)
 
-client = Groq(api_key=GROQ_API_KEY)
 
 st.set_page_config(page_title="Code-Doctor: AI GitHub Bug Fixer", page_icon="🐙", layout="wide")
 
@@ -124,6 +192,12 @@ st.markdown("<hr>", unsafe_allow_html=True)
 
 github_url = st.text_input("🔗 Enter GitHub Repository Link:", placeholder="https://github.com/user/repo")
 branch = st.radio("📂 Select Branch:", ["main", "master"])
+max_workers = st.slider(
+    "⚡ Issues processed concurrently:", min_value=1, max_value=32,
+    value=int(os.getenv("CODEDOC_MAX_WORKERS", "8")),
+)
+stream_responses = st.checkbox("📡 Stream AI responses as they are generated", value=True)
+reuse_results = st.checkbox("♻️ Reuse stored fixes for unchanged issues", value=True)
 
 def extract_repo_details(github_url):
     """Extracts repository owner and name from GitHub URL."""
@@ -131,76 +205,47 @@ def extract_repo_details(github_url):
     return (parts[-2], parts[-1]) if len(parts) >= 2 else (None, None)
 
 def fetch_github_issues(owner, repo):
-    """Fetches open issues from GitHub."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
-    return response.json() if response.status_code == 200 else []
+    """Fetches all open issues from GitHub, following pagination."""
+    return github_api.fetch_github_issues(owner, repo, GITHUB_TOKEN)
 
-# def fetch_repo_files(owner, repo, branch):
-#     """Fetch all source files from the repo, ignoring directories."""
-#     url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
-#     headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-#     response = requests.get(url, headers=headers)
-#     # print([file for file in response.json().get("tree", [])])
-#     return [file["path"] for file in response.json().get("tree", []) if "path" in file and file["type"] == "blob"] if response.status_code == 200 else []
+def fetch_repo_blobs(owner, repo, branch, run=None):
+    """Maps every file in the repo to its blob SHA (a RepoTree), fetching subtrees if the listing was truncated."""
+    return repo_tree.load_repo_tree(owner, repo, branch, GITHUB_TOKEN, run=run)
 
 
-import requests
-
-def fetch_repo_files(owner, repo, branch):
-    """Fetch all source files from the repo, handling pagination properly."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        print("Error:", response.status_code, response.json())
-        return []
-
-    tree = response.json().get("tree", [])
-    
-    # Debugging: Check if test/CMakeLists.txt is present
-    for file in tree:
-        if file["path"] == "test/CMakeLists.txt":
-            print("File Found:", file)
-
-    return [file["path"] for file in tree if file["type"] == "blob"]
-
-
-
-@lru_cache(maxsize=10)
-def fetch_github_issues_cached(owner, repo):
-    """Fetch issues with caching to prevent redundant API calls."""
-    return fetch_github_issues(owner, repo)
-
-@lru_cache(maxsize=10)
-def fetch_repo_files_cached(owner, repo, branch):
-    """Fetch repo files with caching."""
-    return fetch_repo_files(owner, repo, branch)
-
+def notify(notes, level, message):
+    """Shows a Streamlit message, or queues it when running inside a worker thread."""
+    if notes is None:
+        getattr(st, level)(message)
+    else:
+        notes.append((level, message))
 
 
-def fetch_buggy_code(owner, repo, file_path, branch):
+def fetch_buggy_code(owner, repo, file_path, branch, notes=None, snapshot=None):
     """Fetch buggy file content from GitHub using the extracted full file path."""
     if not file_path:
         return None
 
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}?ref={branch}"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
-    response_data = response.json()
+    # Multi-issue runs read from the local branch snapshot; the contents API is the fallback
+    if snapshot is not None and snapshot.has(file_path):
+        try:
+            return snapshot.read(file_path)
+        except Exception as e:
+            notify(notes, "error", f"❌ Error decoding file `{file_path}`: {e}")
+            return None
+
+    _, response_data = github_api.fetch_contents(owner, repo, file_path, branch, GITHUB_TOKEN)
 
     if isinstance(response_data, dict) and "content" in response_data:
         try:
             return base64.b64decode(response_data["content"]).decode("utf-8")
         except Exception as e:
-            st.error(f"❌ Error decoding file `{file_path}`: {e}")
+            notify(notes, "error", f"❌ Error decoding file `{file_path}`: {e}")
             return None
     elif isinstance(response_data, list):
-        st.error(f"❌ `{file_path}` appears to be a directory, not a file.")
+        notify(notes, "error", f"❌ `{file_path}` appears to be a directory, not a file.")
     else:
-        st.error(f"❌ Failed to fetch `{file_path}`: {response_data.get('message', 'Unknown error')}")
+        notify(notes, "error", f"❌ Failed to fetch `{file_path}`: {response_data.get('message', 'Unknown error')}")
     return None
 
 
@@ -213,130 +258,520 @@ def is_code_related(issue_body):
 
 
 
-def fix_code_with_ai(code_snippet, language, issue_body):
-    """Generates AI-powered bug fixes with clear explanations based on the given GitHub issue."""
-    try:
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an AI  that fixes code and suggests optimizations and suggest code whenever required. \n"
-                                                  "Strictly follow this format:\n\n"
-                                                  "**Root Cause:** (Clearly explain the issue in one line.)\n\n"
-                                                  "**Fixed Code:** (Provide only the corrected code.)\n\n"
-                                                  "**Explanation:** (Summarize how the fix solves the issue.)"},
-                {"role": "user", "content": f"Fix this {language} code strictly based on the given GitHub issue. \n\n"
-                                              f"### GitHub Issue:\n{issue_body}\n\n"
-                                              f"### Buggy Code:\n```{language}\n{code_snippet}\n```"},
-            ],
-            model="llama-3.3-70b-versatile",
+def fix_messages(code_snippet, language, issue_body, excerpt=False):
+    excerpt_note = (
+        "The code is an excerpt of a larger file. Keep every `--- lines a-b ---` marker line "
+        "and return the whole corrected excerpt.\n\n"
+    ) if excerpt and not PATCH_MODE else ""
+    fixed_code = (
+        "(Only the changes, as search/replace blocks inside a ```diff block.)\n\n" + patching.PATCH_INSTRUCTIONS
+        if PATCH_MODE else "(Provide only the corrected code.)"
+    )
+    return [
+        {"role": "system", "content": "You are an AI  that fixes code and suggests optimizations and suggest code whenever required. \n"
+                                          "Strictly follow this format:\n\n"
+                                          "**Root Cause:** (Clearly explain the issue in one line.)\n\n"
+                                          f"**Fixed Code:** {fixed_code}\n\n"
+                                          "**Explanation:** (Summarize how the fix solves the issue.)"},
+        {"role": "user", "content": f"Fix this {language} code strictly based on the given GitHub issue. \n\n"
+                                      f"### GitHub Issue:\n{issue_body}\n\n"
+                                      f"{excerpt_note}"
+                                      f"### Buggy Code:\n```{language}\n{code_snippet}\n```"},
+    ]
+
+
+def route_fix(source, language, issue_body, file_path):
+    """Slices the file and picks the fix model, shrinking the slice until some candidate fits.
+
+    Returns (context, model, prompt_tokens); raises ``token_budget.PromptTooLarge`` if even
+    the smallest slice is too big.
+    """
+    budget = CONTEXT_TOKENS
+    while True:
+        context = slice_context(source, language, issue_body, file_path, budget=budget)
+        messages = fix_messages(context.text, language, issue_body, excerpt=not context.is_whole_file)
+        answer_tokens = expected_answer_tokens(context.text, FIX_MODELS[0])
+        try:
+            model, prompt_tokens = token_budget.route(messages, FIX_MODELS, answer_tokens, FIX_MIN_TIER)
+            return context, model, prompt_tokens
+        except token_budget.PromptTooLarge:
+            if budget <= MIN_CONTEXT_TOKENS:
+                raise
+            budget = max(MIN_CONTEXT_TOKENS, budget * 2 // 3)
+
+
+def send_fix_request(model, messages, on_text, stats, refresh=False, cancel=None):
+    """Sends one fix request (streamed when ``on_text`` is given) through the cache and scheduler.
+
+    A set ``cancel`` event aborts the request before it is sent or while it streams.
+    """
+    # Created once per process on first use, so reruns neither import groq nor rebuild clients
+    client = get_groq_client(GROQ_API_KEY)
+
+    def check():
+        if cancel is not None and cancel.is_set():
+            raise hedging.Cancelled()
+
+    def show(text):
+        check()
+        on_text(text)
+
+    if on_text is not None:
+        request = lambda: check() or streaming.stream_groq(client, model, messages, show, stats)
+    else:
+        request = lambda: check() or streaming.timed_call(
+            lambda: client.chat.completions.create(messages=messages, model=model).choices[0].message.content,
+            stats,
         )
+    call = lambda: get_scheduler().call("groq", model, request)
+    return cached_completion(model, messages, call, refresh=refresh)
+
+
+def expected_answer_tokens(code_snippet, model):
+    if PATCH_MODE:
+        return patching.PATCH_TOKENS + FIX_ANSWER_TOKENS
+    return token_budget.count_tokens(code_snippet, model) + FIX_ANSWER_TOKENS
+
+
+def parse_fix(ai_response, source=None):
+    """Extracts the Root Cause / Fixed Code / Explanation sections; missing ones are "Not Found".
+
+    In patch mode the Fixed Code block is applied to ``source``: "Fixed Code" becomes the patched
+    code and "Patch" keeps the blocks. A patch that does not apply counts as no fix ("Patch Error").
+    """
+    root_cause_match = re.search(r"\*\*Root Cause:\*\*\s*(.*?)\n", ai_response, re.DOTALL)
+    fixed_code_match = re.search(r"\*\*Fixed Code:\*\*\s*```(?:\w+)?\n(.*?)```", ai_response, re.DOTALL)
+    explanation_match = re.search(r"\*\*Explanation:\*\*\s*(.*)", ai_response, re.DOTALL)
+    sections = {
+        "Root Cause": root_cause_match.group(1).strip() if root_cause_match else "Not Found",
+        "Fixed Code": fixed_code_match.group(1).strip() if fixed_code_match else "Not Found",
+        "Explanation": explanation_match.group(1).strip() if explanation_match else "Not Found",
+    }
+    if PATCH_MODE and source is not None and sections["Fixed Code"] != "Not Found":
+        sections["Patch"] = sections["Fixed Code"]
+        patched, error = patching.try_apply(source, sections["Patch"])
+        sections["Fixed Code"] = patched if patched is not None else "Not Found"
+        if error:
+            sections["Patch Error"] = error
+    return sections
+
+
+def hedge_candidates(model, messages, code_snippet):
+    """The routed model followed by the backup models whose context window and tier also fit."""
+    candidates = [model]
+    for backup in HEDGE_MODELS:
+        if backup in candidates or token_budget.model_info(backup)["tier"] < FIX_MIN_TIER:
+            continue
+        answer_tokens = expected_answer_tokens(code_snippet, backup)
+        if token_budget.count_messages(messages, backup) <= token_budget.prompt_capacity(backup, answer_tokens):
+            candidates.append(backup)
+    return candidates
+
+
+def hedged_fix(candidates, messages, on_text, stats, source):
+    """Races the candidates and returns (model, response) of the first one whose sections all parse.
+
+    Only the first model to produce text streams into ``on_text``; ``stats`` receives the winner's timings.
+    """
+    ctx = get_script_run_ctx()
+    run, item = telemetry.current()
+    attempt_stats = {}
+    leader = []
+    leader_lock = threading.Lock()
+
+    def attach_context():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    def attempt(model, cancel):
+        attempt_stats[model] = streaming.new_stats(model)
+
+        def show(text):
+            with leader_lock:
+                if not leader:
+                    leader.append(model)
+            if leader[0] == model:
+                on_text(text)
+
+        with telemetry.activate(run), telemetry.stage("llm", item, model=model, hedged=True):
+            text = send_fix_request(model, messages, show if on_text else None, attempt_stats[model], cancel=cancel)
+            streaming.settle_stats(attempt_stats[model])
+            telemetry.note_llm(attempt_stats[model])
+        return text.strip()
+
+    complete = lambda text: "Not Found" not in parse_fix(text, source).values()
+    model, ai_response = hedging.hedge(candidates, attempt, complete, initializer=attach_context)
+    stats.update(attempt_stats[model])
+    return model, ai_response
+
+
+def fix_code_with_ai(code_snippet, language, issue_body, notes=None, attempt=0, excerpt=False,
+                     on_text=None, stats=None, model=None):
+    """Generates AI-powered bug fixes with clear explanations based on the given GitHub issue.
+
+    With ``on_text`` the response is streamed and the callback receives the text so far;
+    ``stats`` collects time-to-first-token and throughput. With CODEDOC_HEDGE_MODELS set, the
+    first request is hedged across those models too.
+    """
+    try:
+        model = model or FIX_MODELS[0]
+        messages = fix_messages(code_snippet, language, issue_body, excerpt)
+        if stats is None:
+            stats = streaming.new_stats(model)
+        candidates = hedge_candidates(model, messages, code_snippet) if attempt == 0 else [model]
+        if len(candidates) > 1:
+            _, ai_response = hedged_fix(candidates, messages, on_text, stats, code_snippet)
+        else:
+            stats["model"] = model  # a retry after a hedged first attempt goes to the routed model again
+            # Retries bypass the cache lookup, otherwise they would replay the same unusable answer
+            with telemetry.stage("llm", attempt=attempt):
+                ai_response = send_fix_request(model, messages, on_text, stats, refresh=attempt > 0)
+                streaming.settle_stats(stats)
+                telemetry.note_llm(stats)
 
         # 🔍 Debug: Print full AI response
-        ai_response = response.choices[0].message.content.strip()
+        ai_response = ai_response.strip()
         # st.write("### 🔍 Raw AI Response:")
         # st.code(ai_response, language="markdown")
 
         # Use regex to extract sections
-        root_cause_match = re.search(r"\*\*Root Cause:\*\*\s*(.*?)\n", ai_response, re.DOTALL)
-        fixed_code_match = re.search(r"\*\*Fixed Code:\*\*\s*```(?:\w+)?\n(.*?)```", ai_response, re.DOTALL)
-        explanation_match = re.search(r"\*\*Explanation:\*\*\s*(.*)", ai_response, re.DOTALL)
-
-        formatted_sections = {
-            "Root Cause": root_cause_match.group(1).strip() if root_cause_match else "Not Found",
-            "Fixed Code": fixed_code_match.group(1).strip() if fixed_code_match else "Not Found",
-            "Explanation": explanation_match.group(1).strip() if explanation_match else "Not Found",
-        }
-
-        # 🔍 Debug: Print extracted sections
-        st.write("### 🛠 Extracted Sections from AI:")
-        st.write(f"**Root Cause:** {formatted_sections['Root Cause']}")
-        st.code(formatted_sections["Fixed Code"], language=language.lower() if language != "Unknown" else "plaintext")
-        st.write(f"**Explanation:** {formatted_sections['Explanation']}")
+        with telemetry.stage("parse"):
+            formatted_sections = parse_fix(ai_response, code_snippet)
+        if "Patch Error" in formatted_sections:
+            notify(notes, "warning", f"⚠️ The suggested patch did not apply: {formatted_sections['Patch Error']}")
 
         # Check if fixed code is missing
+        if formatted_sections["Fixed Code"] == "Not Found" and attempt < FIX_RETRIES:
+            notify(notes, "warning", "⚠️ AI did not generate a fix. Retrying...")
+            return fix_code_with_ai(code_snippet, language, issue_body, notes, attempt + 1, excerpt=excerpt,
+                                    on_text=on_text, stats=stats, model=model)
         if formatted_sections["Fixed Code"] == "Not Found":
-            st.warning("⚠️ AI did not generate a fix. Retrying...")
-            return fix_code_with_ai(code_snippet, language, issue_body)  # Retry once
+            notify(notes, "warning", f"⚠️ AI did not generate a fix after {attempt + 1} attempts.")
 
         return formatted_sections
 
     except Exception as e:  
-        st.error(f"❌ AI Error: {e}")
+        notify(notes, "error", f"❌ AI Error: {e}")
         return None
 
 
+LANGUAGE_MAP = {
+    ".py": "Python", ".cpp": "C++", ".js": "JavaScript",
+    ".c": "C", ".java": "Java", ".txt": "",
+}
 
-if st.button("🔍 Fetch & Fix All Issues"):
-    if github_url.strip():
-        owner, repo = extract_repo_details(github_url)
-        
-        if owner and repo:
-            with st.spinner("📡 Fetching GitHub issues..."):
-                issues = fetch_github_issues_cached(owner, repo)
-
-            if issues:
-                repo_files = fetch_repo_files_cached(owner, repo, branch)
-                
-                st.subheader("🐞 Processing GitHub Issues")
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", size=12)
-
-                filtered_issues = [issue for issue in issues if is_code_related(issue.get("body", ""))]
+def detect_language(file_path):
+    """Detect language from file extension."""
+    file_extension = os.path.splitext(file_path)[1].lower()
+    return LANGUAGE_MAP.get(file_extension, "Unknown")
 
 
+def empty_result(notes=None):
+    return {"file_path": None, "language": "Unknown", "buggy_code": None, "context": None, "fix": None,
+            "merged_code": None, "model": None, "llm_stats": None, "notes": notes or [], "from_store": False}
 
-                for idx, issue in enumerate(filtered_issues):
 
-                    print('start1')
-                    file_path = extract_file_path(issue["body"], repo_files)
-                    
-                    # Extract issue status (open or closed)
-                    issue_status = issue.get("state", "unknown").capitalize()
+def compact_result(result):
+    """What re-rendering a finished issue needs: the file contents and the context slice are dropped."""
+    context = result["context"]
+    return dict(result, buggy_code=None, merged_code=None, context=None, had_code=bool(result["buggy_code"]),
+                context_note=None if context is None or context.is_whole_file else context.describe())
 
-                    st.markdown(f"### 🔍 Issue {idx+1}: {issue['title']} ({issue_status})")
-                    st.write(issue["body"])
-                    print(idx+1)
-                    print('start2')
-                    # Debugging: Print all repo files
-                    # st.write(f"🔍 Available repo files: {repo_files}")
 
-                    # Debugging: Print extracted file path
-                    # if file_path:
-                    #     st.markdown(f"✅ **Matched File:** `{file_path}`")
-                    # else:
-                    #     st.warning(f"⚠️ No matching file found for issue {idx+1}.")
-                    #     continue  # Skip this issue if no file path is found
+def stored_result(issue, record):
+    """Rebuilds a result from the results store, with the context regions the model was sent."""
+    result = empty_result()
+    result.update(file_path=record["file_path"], language=record["language"], buggy_code=record["code"],
+                  fix=record["fix"], merged_code=record["merged_code"], model=record["fix_model"], from_store=True)
+    if record["context"]:
+        result["context"] = CodeContext(record["code"], [tuple(region) for region in record["context"]], record["language"])
+    else:
+        # Rows stored before the regions were kept; the default budget may differ from the one routed
+        result["context"] = slice_context(record["code"], record["language"], issue["body"], record["file_path"])
+    return result
+
+
+def process_issue(issue, owner, repo, branch, path_index, snapshot=None, on_text=None, run=None, results=None,
+                  file_path=EXTRACT):
+    """Runs path extraction, code fetch and AI fix for one issue without touching the UI.
+
+    Safe to run in a worker thread; messages are queued in ``notes`` and rendered later.
+    ``on_text`` is the only UI hook: it receives the streamed response as it grows.
+    Stage timings go to ``run`` (a ``telemetry.Run``) and finished fixes to ``results``
+    (a ``RepoResults``) when given. A ``file_path`` already resolved by ``extract_file_paths``
+    (None for "no file") skips the per-issue extraction call.
+    """
+    with telemetry.activate(run), telemetry.stage("issue", issue.get("number")):
+        result = _process_issue(issue, owner, repo, branch, path_index, snapshot, on_text, file_path)
+        if results is not None and result["file_path"]:
+            with telemetry.stage("store_save"):
+                results.save(issue, result)
+        return result
+
+
+def _process_issue(issue, owner, repo, branch, path_index, snapshot, on_text, file_path=EXTRACT):
+    result = empty_result()
+    if file_path is EXTRACT:
+        with telemetry.stage("path_extraction"):
+            file_path = extract_file_path(issue["body"], path_index)
+    if not file_path:
+        return result
+    result["file_path"] = file_path
+    result["language"] = detect_language(file_path)
+    with telemetry.stage("blob_fetch", source="snapshot" if snapshot is not None else "api"):
+        result["buggy_code"] = fetch_buggy_code(owner, repo, file_path, branch, result["notes"], snapshot)
+    if result["buggy_code"]:
+        # Only the functions relevant to the issue go into the prompt, sized for the routed model
+        with telemetry.stage("context_slice"):
+            try:
+                context, model, prompt_tokens = route_fix(result["buggy_code"], result["language"], issue["body"], file_path)
+            except token_budget.PromptTooLarge as e:
+                result["notes"].append(("error", f"❌ {e}"))
+                return result
+            telemetry.note(model=model, predicted_prompt_tokens=prompt_tokens)
+        result["context"] = context
+        result["llm_stats"] = streaming.new_stats(model)
+        result["fix"] = fix_code_with_ai(
+            context.text, result["language"], issue["body"], result["notes"], excerpt=not context.is_whole_file,
+            on_text=on_text, stats=result["llm_stats"], model=model,
+        )
+        if result["fix"]:
+            result["merged_code"] = context.merge(result["fix"]["Fixed Code"])
+            result["model"] = result["llm_stats"]["model"]  # the routed model, or the hedge winner
+    return result
 
-                    if not file_path:
-                        st.warning(f"⚠️ No valid file path found for issue {idx+1}. Skipping to the next issue.")
-                        continue  # Skip to the next issue
 
-                    st.markdown(f"✅ **Matched File:** `{file_path}`")
+def process_issues_concurrently(issues, owner, repo, branch, path_index, max_workers, snapshot=None,
+                                stream_to=None, run=None, results=None, file_paths=None):
+    """Processes (index, issue) pairs on a bounded thread pool, yielding (index, result) as each one finishes.
 
-                    # Fetch buggy code
-                    buggy_code = fetch_buggy_code(owner, repo, file_path, branch)
+    ``stream_to(idx)`` may return a per-issue callback for streamed model output; ``file_paths``
+    maps indexes to paths resolved up front.
+    """
+    ctx = get_script_run_ctx()
 
-                    # Detect language from file extension
-                    file_extension = os.path.splitext(file_path)[1].lower()
-                    language_map = {
-                        ".py": "Python", ".cpp": "C++", ".js": "JavaScript",
-                        ".c": "C", ".java": "Java", ".txt": "",
-                    }
-                    language = language_map.get(file_extension, "Unknown")
+    def attach_context():
+        # Lets workers update their own issue placeholder while a response streams in
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
 
-                    # Debugging: Print extracted code snippet and language
-                    if buggy_code:
-                        st.markdown(f"### 📝 Extracted Code Snippet")
-                        st.code(buggy_code, language=language.lower() if language != "Unknown" else "plaintext")
-                        st.markdown(f"🌍 **Detected Language:** `{language}`")
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), initializer=attach_context)
+    try:
+        futures = {
+            executor.submit(
+                process_issue, issue, owner, repo, branch, path_index, snapshot,
+                stream_to(idx) if stream_to else None, run, results,
+                file_paths[idx] if file_paths is not None and idx in file_paths else EXTRACT,
+            ): idx
+            for idx, issue in issues
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                yield idx, future.result()
+            except Exception as e:
+                yield idx, empty_result([("error", f"❌ Pipeline Error: {e}")])
+    finally:
+        # Closing the generator early (rerun, Stop, an error) cancels the queued issues instead of waiting on them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_stream(slot, idx, issue):
+    """Returns a callback that shows a streaming response in the issue's placeholder."""
+    def show(text):
+        sections = streaming.parse_partial_sections(text)
+        with slot.container():
+            st.markdown(f"### ⏳ Issue {idx+1}: {issue['title']} — generating fix...")
+            if "Root Cause" in sections:
+                st.markdown(f"**Root Cause:** {sections['Root Cause']}")
+            if "Fixed Code" in sections:
+                st.code(sections["Fixed Code"])
+            if "Explanation" in sections:
+                st.markdown(f"**Explanation:** {sections['Explanation']}")
+            if not sections:
+                st.text(text[-2000:])
+    return show
+
+
+def render_issue(idx, issue, result):
+    """Renders one processed issue into the current Streamlit container."""
+    # Extract issue status (open or closed)
+    issue_status = issue.get("state", "unknown").capitalize()
+
+    st.markdown(f"### 🔍 Issue {idx+1}: {issue['title']} ({issue_status})")
+    st.write(issue["body"])
+
+    file_path = result["file_path"]
+    if not file_path:
+        st.warning(f"⚠️ No valid file path found for issue {idx+1}. Skipping to the next issue.")
+        return
+
+    st.markdown(f"✅ **Matched File:** `{file_path}`")
+
+    language = result["language"]
+    code_language = language.lower() if language != "Unknown" else "plaintext"
+    buggy_code = result["buggy_code"]
+    for level, message in result["notes"]:
+        getattr(st, level)(message)
+
+    if buggy_code or result.get("had_code"):
+        if buggy_code:
+            st.markdown("### 📝 Extracted Code Snippet")
+            st.code(buggy_code, language=code_language)
+        else:
+            st.caption("📝 The extracted code is not kept after a run; run again to see it.")
+        st.markdown(f"🌍 **Detected Language:** `{language}`")
+        context = result["context"]
+        if context is not None and not context.is_whole_file:
+            st.caption(f"✂️ Sent to the model: {context.describe()}")
+        elif result.get("context_note"):
+            st.caption(f"✂️ Sent to the model: {result['context_note']}")
+
+        fix_details = result["fix"]
+        if fix_details:
+            st.markdown(f"### 🔍 Root Cause\n{fix_details['Root Cause']}")
+            st.code(fix_details["Fixed Code"], language=code_language)
+            if fix_details.get("Patch"):
+                with st.expander("🩹 Patch returned by the model"):
+                    st.code(fix_details["Patch"], language="diff")
+            st.markdown(f"### 📝 Explanation\n{fix_details['Explanation']}")
+            if context is not None and not context.is_whole_file and result["merged_code"]:
+                with st.expander("📄 Full fixed file"):
+                    st.code(result["merged_code"], language=code_language)
+        if result["from_store"]:
+            fixed_by = f" (fixed by {result['model']})" if result["model"] else ""
+            st.caption(f"♻️ Issue and file unchanged since the last run — served from the results store{fixed_by}")
+        elif result["llm_stats"]:
+            st.caption(streaming.format_stats(result["llm_stats"]))
+    else:
+        st.warning(f"⚠️ Failed to retrieve the code from `{file_path}`.")
+
+
+
+def render_run_outputs(last_run):
+    """Report download, cache summary and per-stage timing panel of a finished run."""
+    st.caption(last_run["cache_summary"])
+    if last_run["report_path"] and os.path.exists(last_run["report_path"]):
+        with open(last_run["report_path"], "rb") as f:
+            st.download_button("📄 Download Fix Report (PDF)", f, file_name=os.path.basename(last_run["report_path"]),
+                               mime="application/pdf")
+    elif last_run["report_error"]:
+        st.error(f"❌ Could not write the PDF report: {last_run['report_error']}")
+    run = last_run["run"]
+    jsonl_path, prom_path = last_run["exports"]
+    with st.expander("📈 Pipeline timings"):
+        st.table(run.summary())
+        st.caption(f"Exported to `{jsonl_path}` and `{prom_path}`")
+        st.download_button("⬇️ Download timings (JSONL)", run.to_jsonl(), file_name=f"codedoc-{run.run_id}.jsonl")
+    if last_run.get("hedge_summary"):
+        with st.expander("🏁 Hedged requests (this session)"):
+            st.table(last_run["hedge_summary"])
+
+
+# Results live in session state, so widget changes and download clicks re-render them without refetching
+run_requested = st.button("🔍 Fetch & Fix All Issues")
+last_run = st.session_state.get("last_run")
+if not run_requested and last_run and last_run["key"] == (github_url.strip(), branch):
+    st.subheader("🐞 Processing GitHub Issues")
+    for idx, issue in enumerate(last_run["issues"]):
+        if idx in last_run["results"]:
+            render_issue(idx, issue, last_run["results"][idx])
+    render_run_outputs(last_run)
+
+if run_requested:
+    if github_url.strip():
+        owner, repo = extract_repo_details(github_url)
+        
+        if owner and repo:
+            run = telemetry.Run("main")
+            try:
+                with st.spinner("📡 Fetching GitHub issues..."), telemetry.activate(run), telemetry.stage("issue_fetch"):
+                    issues = fetch_github_issues(owner, repo)
+            except github_api.GitHubError as e:
+                st.error(f"❌ Could not fetch the issues: {e}")
+                issues = []
 
-                        fix_details = fix_code_with_ai(buggy_code, language, issue["body"])
-                        if fix_details:
-                            st.markdown(f"### 🔍 Root Cause\n{fix_details['Root Cause']}")
-                            st.code(fix_details["Fixed Code"], language=language.lower() if language != "Unknown" else "plaintext")
-                            st.markdown(f"### 📝 Explanation\n{fix_details['Explanation']}")
-                    else:
-                        st.warning(f"⚠️ Failed to retrieve the code from `{file_path}`.")
+            if issues:
+                with telemetry.activate(run):
+                    with telemetry.stage("tree_fetch"):
+                        blob_shas = fetch_repo_blobs(owner, repo, branch, run)
+                        telemetry.note(files=len(blob_shas), complete=blob_shas.complete)
+                    with telemetry.stage("path_index"):
+                        path_index = path_index_module.get_path_index(owner, repo, branch, blob_shas)
+                        telemetry.note(kb=path_index.nbytes() // 1024)
+                if not blob_shas.complete:
+                    st.warning("⚠️ Part of the repository tree could not be fetched; issues in the missing folders may not find their files.")
+                
+                st.subheader("🐞 Processing GitHub Issues")
+                from report import ReportWriter  # pulls in fpdf, only needed once a run starts
+                report = ReportWriter(f"Code-Doctor fix report: {owner}/{repo} ({branch})")
+                try:
+                    filtered_issues = [issue for issue in issues if is_code_related(issue.get("body", ""))]
+
+                    # Issues whose text, target file and model are unchanged are served from the store
+                    results = get_results_store().for_repo(owner, repo, branch, blob_shas, ",".join(FIX_MODELS + HEDGE_MODELS) + ("|patch" if PATCH_MODE else ""))
+                    stored = {}
+                    if reuse_results:
+                        with telemetry.activate(run), telemetry.stage("store_lookup"):
+                            for idx, issue in enumerate(filtered_issues):
+                                record = results.fresh(issue)
+                                if record is not None:
+                                    stored[idx] = stored_result(issue, record)
+                    pending = [(idx, issue) for idx, issue in enumerate(filtered_issues) if idx not in stored]
+
+                    snapshot = None
+                    if len(pending) >= SNAPSHOT_MIN_ISSUES:
+                        with st.spinner("📦 Downloading repository snapshot..."), telemetry.activate(run), \
+                                telemetry.stage("snapshot"):
+                            snapshot = snapshot_module.get_snapshot(owner, repo, branch, GITHUB_TOKEN)
+                        if snapshot is None:
+                            st.info("ℹ️ Snapshot unavailable, fetching files one by one.")
+
+                    file_paths = None
+                    if len(pending) > 1:
+                        with st.spinner("🔎 Locating the files the issues refer to..."), telemetry.activate(run), \
+                                telemetry.stage("path_extraction_batch", size=len(pending)):
+                            file_paths = extract_file_paths(pending, path_index, max_workers, run)
+
+                    # One placeholder per issue keeps results in issue order while they finish out of order
+                    slots = []
+                    for idx, issue in enumerate(filtered_issues):
+                        slot = st.empty()
+                        slot.info(f"⏳ Issue {idx+1}: {issue['title']} — processing...")
+                        slots.append(slot)
+
+                    stream_to = (lambda idx: render_stream(slots[idx], idx, filtered_issues[idx])) if stream_responses else None
+                    progress = st.progress(0.0)
+                    if stored:
+                        st.caption(f"♻️ {len(stored)} of {len(filtered_issues)} issues unchanged since the last run")
+                    finished = itertools.chain(stored.items(), process_issues_concurrently(
+                        pending, owner, repo, branch, path_index, max_workers, snapshot, stream_to, run, results, file_paths
+                    ))
+                    finished_results = {}
+                    for done, (idx, result) in enumerate(finished, start=1):
+                        with telemetry.activate(run), telemetry.stage("render", filtered_issues[idx].get("number")):
+                            with slots[idx].container():
+                                render_issue(idx, filtered_issues[idx], result)
+                        report.add(idx, filtered_issues[idx], result)
+                        finished_results[idx] = compact_result(result)
+                        progress.progress(done / len(filtered_issues))
+                    with telemetry.activate(run), telemetry.stage("report"):
+                        report_path = report.close()
+                finally:
+                    report.cancel()  # a rerun or stop mid-run must not leave the writer thread waiting
+                st.session_state["last_run"] = {
+                    "key": (github_url.strip(), branch),
+                    "issues": filtered_issues,
+                    "results": finished_results,
+                    "report_path": report_path,
+                    "report_error": report.error,
+                    "cache_summary": get_llm_cache().summary(),
+                    "run": run,
+                    "exports": run.export(),
+                    "hedge_summary": hedging.get_hedge_stats().summary(),
+                }
+                render_run_outputs(st.session_state["last_run"])
+                get_results_store().prune_blobs()
 
 
 
@@ -344,3 +779,4 @@ if st.button("🔍 Fetch & Fix All Issues"):
         st.warning("⚠️ Please enter a GitHub repository link.")
 
 st.markdown("**🚀 Built with ❤️ by Ankan Moh, Hanvik S and Sanjay Maj.**")
+st.caption(f"⏱️ Script run {(time.perf_counter() - SCRIPT_STARTED) * 1000:.0f} ms (imports {IMPORT_SECONDS * 1000:.0f} ms)")
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import tempfile
+from collections import defaultdict
+from disk_cache import CACHE_DIR
+
+MANIFEST_DIR = os.path.join(CACHE_DIR, "manifests")
+MANIFEST_VERSION = 1
+SAMPLE_FILES = ("bug.json", "method_before.txt", "method_after.txt")
+
+
+def default_manifest_path(source):
+    """Manifest location for a corpus, keyed by its absolute path or source URL."""
+    if "://" not in source:
+        source = os.path.abspath(source)
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MANIFEST_DIR, key + ".jsonl")
+
+
+def _sample_dirs(root):
+    """Yields (directory, {name: stat}) for every sample directory, in sorted order."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            entries = sorted(os.scandir(d), key=lambda e: e.name)
+        except OSError:
+            continue
+        files = {e.name: e for e in entries if e.is_file(follow_symlinks=False)}
+        if all(name in files for name in SAMPLE_FILES):
+            yield d, {name: files[name].stat() for name in SAMPLE_FILES}
+        stack.extend(e.path for e in reversed(entries) if e.is_dir(follow_symlinks=False) and not e.name.startswith("."))
+
+
+def _index_sample(root, d, stats):
+    digest = hashlib.sha256()
+    for name in SAMPLE_FILES:
+        with open(os.path.join(d, name), "rb") as f:
+            data = f.read()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+        if name == "bug.json":
+            meta = json.loads(data)
+    return {
+        "path": os.path.relpath(d, root),
+        "bug_type": meta.get("bug_type", "Unknown"),
+        "severity": meta.get("severity", "Unknown"),
+        "meta": meta,
+        "hash": digest.hexdigest(),
+        "size": sum(s.st_size for s in stats.values()),
+        "mtime_ns": max(s.st_mtime_ns for s in stats.values()),
+    }
+
+
+def build_manifest(root, previous=None):
+    """Indexes every sample under ``root``. Returns (entries, errors).
+
+    Entries from ``previous`` whose files have the same size and mtime are reused without
+    reading the files again, so refreshing a mostly unchanged corpus only costs a directory walk.
+    """
+    known = {e["path"]: e for e in previous or ()}
+    entries, errors = [], []
+    for d, stats in _sample_dirs(root):
+        rel = os.path.relpath(d, root)
+        old = known.get(rel)
+        if old and old["size"] == sum(s.st_size for s in stats.values()) \
+                and old["mtime_ns"] == max(s.st_mtime_ns for s in stats.values()):
+            entries.append(old)
+            continue
+        try:
+            entries.append(_index_sample(root, d, stats))
+        except (OSError, ValueError, AttributeError) as e:
+            errors.append(f"{d}: {e}")
+    return entries, errors
+
+
+def save_manifest(path, root, entries):
+    """Writes the manifest atomically: a header line, then one entry per line."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"version": MANIFEST_VERSION, "root": os.path.abspath(root), "count": len(entries)}) + "\n")
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+
+
+def load_manifest(path):
+    """Reads a saved manifest; returns None if it is missing or from another version."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != MANIFEST_VERSION:
+                return None
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return None
+
+
+def get_manifest(root, path=None, refresh=False):
+    """Loads the manifest for ``root``, building it on first use. Returns (entries, errors).
+
+    With ``refresh`` the corpus is rescanned and only new or changed samples are re-read.
+    """
+    path = path or default_manifest_path(root)
+    entries = load_manifest(path)
+    if entries is not None and not refresh:
+        return entries, []
+    entries, errors = build_manifest(root, entries)
+    save_manifest(path, root, entries)
+    return entries, errors
+
+
+def _rank(entry, seed):
+    return hashlib.sha256(f"{seed}:{entry['path']}".encode("utf-8")).hexdigest()
+
+
+def stratified_sample(entries, n, by=("bug_type", "severity"), seed=0):
+    """Picks ``n`` entries with each stratum represented in proportion to its size.
+
+    Selection depends only on the entries and ``seed``, never on filesystem order. Quotas use
+    largest remainders, so rounding never over- or under-fills the sample.
+    """
+    if n is None or n >= len(entries):
+        return sorted(entries, key=lambda e: _rank(e, seed))
+    strata = defaultdict(list)
+    for entry in entries:
+        strata[tuple(entry.get(k) for k in by)].append(entry)
+    keys = sorted(strata, key=str)
+    exact = {k: n * len(strata[k]) / len(entries) for k in keys}
+    quota = {k: int(exact[k]) for k in keys}
+    for k in sorted(keys, key=lambda k: (quota[k] - exact[k], str(k)))[:n - sum(quota.values())]:
+        quota[k] += 1
+    picked = []
+    for k in keys:
+        picked.extend(sorted(strata[k], key=lambda e: _rank(e, seed))[:quota[k]])
+    return sorted(picked, key=lambda e: _rank(e, seed))
+
+
+def shard(entries, index, count):
+    """The entries belonging to shard ``index`` of ``count``; stable as the corpus grows."""
+    return [e for e in entries if int(_rank(e, "shard"), 16) % count == index]
@@ -0,0 +1,201 @@
+import os
+import re
+import math
+from functools import lru_cache
+from difflib import SequenceMatcher
+
+# "difflib" (SequenceMatcher.ratio, the scores of earlier runs) or "lcs" (exact 2*LCS/(len(a)+len(b)))
+SIMILARITY = os.getenv("CODEDOC_SIMILARITY", "difflib").lower()
+BLEU_ORDER = 4
+SMOOTHING_K = 5  # nltk SmoothingFunction default
+
+
+def lcs_length(a, b):
+    """Length of the longest common subsequence of two strings.
+
+    Bit-parallel (Hyyrö): one big-int update per character of ``b``, so memory is linear and the
+    inner loop runs at machine-word speed instead of O(len(a) * len(b)) Python steps.
+    """
+    if not a or not b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    masks = {}
+    for i, ch in enumerate(a):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for ch in b:
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - v.bit_count()
+
+
+def levenshtein_ratio(a, b):
+    """Similarity in [0, 1]: ``SequenceMatcher(None, a, b).ratio()`` by default.
+
+    With ``CODEDOC_SIMILARITY=lcs`` it is the exact indel similarity ``2 * LCS / (len(a) + len(b))``
+    instead, which difflib's greedy matching only approximates. The two can differ a lot on long
+    inputs, so scores from different settings are not comparable.
+    """
+    if SIMILARITY != "lcs":
+        return SequenceMatcher(None, a, b).ratio()
+    total = len(a) + len(b)
+    return 2.0 * lcs_length(a, b) / total if total else 1.0
+
+
+def _ngram_keys(ids, n):
+    """Unique n-grams of an int64 id array and their counts (rows viewed as opaque bytes)."""
+    import numpy as np  # imported on first use so the Streamlit apps start without it
+    if len(ids) < n:
+        return np.empty(0, dtype=f"V{8 * n}"), np.empty(0, dtype=np.int64)
+    windows = np.ascontiguousarray(np.lib.stride_tricks.sliding_window_view(ids, n))
+    keys = windows.view(f"V{8 * n}").ravel()
+    return np.unique(keys, return_counts=True)
+
+
+def _token_ids(tokens):
+    import numpy as np
+    return np.fromiter((hash(t) for t in tokens), dtype=np.int64, count=len(tokens))
+
+
+class Reference:
+    """A ground-truth snippet with its tokenization and n-gram counts precomputed."""
+
+    def __init__(self, normalized):
+        self.normalized = normalized
+        self.tokens = re.findall(r"\w+", normalized)
+        ids = _token_ids(self.tokens)
+        self.ngrams = [_ngram_keys(ids, n) for n in range(1, BLEU_ORDER + 1)]
+        self.sentences = rouge_sentences(normalized)
+
+
+def bleu(reference, hypothesis_tokens):
+    """Sentence BLEU-4 with Chen & Cherry smoothing method 4; same value as nltk's sentence_bleu."""
+    import numpy as np
+    hyp_len = len(hypothesis_tokens)
+    ids = _token_ids(hypothesis_tokens)
+    numerators, denominators = [], []
+    for n in range(1, BLEU_ORDER + 1):
+        hyp_keys, hyp_counts = _ngram_keys(ids, n)
+        ref_keys, ref_counts = reference.ngrams[n - 1]
+        _, hi, ri = np.intersect1d(hyp_keys, ref_keys, assume_unique=True, return_indices=True)
+        numerators.append(int(np.minimum(hyp_counts[hi], ref_counts[ri]).sum()))
+        denominators.append(max(1, int(hyp_counts.sum())))
+    if numerators[0] == 0:
+        return 0.0
+
+    precisions = []
+    smoothing_step = 1
+    for numerator, denominator in zip(numerators, denominators):
+        if numerator == 0 and hyp_len > 1:
+            precisions.append(1 / (2 ** smoothing_step * SMOOTHING_K / math.log(hyp_len)) / denominator)
+            smoothing_step += 1
+        else:
+            precisions.append(numerator / denominator)
+
+    ref_len = len(reference.tokens)
+    if hyp_len > ref_len:
+        brevity = 1
+    elif hyp_len == 0:
+        brevity = 0
+    else:
+        brevity = math.exp(1 - ref_len / hyp_len)
+    return brevity * math.exp(math.fsum(0.25 * math.log(p) for p in precisions if p > 0))
+
+
+def rouge_sentences(text):
+    """Sentence split used by the ``rouge`` package: on '.', with whitespace collapsed."""
+    return [" ".join(s.split()) for s in text.split(".") if len(s) > 0]
+
+
+SMALL_LCS_CELLS = 4096
+
+
+def _lcs_words(x, y, xi, yi):
+    """Words of the LCS of two word lists, reconstructed with the same tie-breaking as ``rouge``.
+
+    ``xi``/``yi`` are the words as integer ids. Large tables are built a row at a time with
+    NumPy: each row is a running maximum over "diagonal + 1 on a match, else the cell above".
+    """
+    if not x or not y:
+        return set()
+    if len(x) * len(y) <= SMALL_LCS_CELLS:
+        table = [[0] * (len(y) + 1)]
+        for i in range(1, len(x) + 1):
+            above, row, xv = table[-1], [0], xi[i - 1]
+            for j in range(1, len(y) + 1):
+                row.append(above[j - 1] + 1 if yi[j - 1] == xv else max(above[j], row[j - 1]))
+            table.append(row)
+        at = lambda i, j: table[i][j]
+    else:
+        import numpy as np
+        dtype = np.uint16 if min(len(x), len(y)) < 65535 else np.uint32
+        xa, ya = np.asarray(xi), np.asarray(yi)
+        table = np.zeros((len(x) + 1, len(y) + 1), dtype=dtype)
+        for i in range(1, len(x) + 1):
+            above = table[i - 1]
+            candidates = np.where(ya == xa[i - 1], above[:-1] + 1, above[1:])
+            np.maximum.accumulate(candidates, out=table[i, 1:])
+        at = lambda i, j: table[i, j]
+
+    words = set()
+    i, j = len(x), len(y)
+    while i > 0 and j > 0:
+        if x[i - 1] == y[j - 1]:
+            words.add(x[i - 1])
+            i -= 1
+            j -= 1
+        elif at(i - 1, j) > at(i, j - 1):
+            i -= 1
+        else:
+            j -= 1
+    return words
+
+
+def rouge_l(reference, hypothesis):
+    """Summary-level ROUGE-L F-score, matching ``Rouge().get_scores(hyp, ref)[0]["rouge-l"]["f"]``.
+
+    Returns 0.0 where the ``rouge`` package would raise (empty input).
+    """
+    hyp_sentences = rouge_sentences(hypothesis)
+    ref_sentences = reference.sentences
+    if not hyp_sentences or not ref_sentences:
+        return 0.0
+    hyp_words = [s.split(" ") for s in hyp_sentences]
+    ref_words = [s.split(" ") for s in ref_sentences]
+    m = len({w for words in ref_words for w in words})
+    n = len({w for words in hyp_words for w in words})
+
+    vocab = {}
+    as_ids = lambda words: [vocab.setdefault(w, len(vocab)) for w in words]
+    hyp_ids = [as_ids(words) for words in hyp_words]
+
+    union = set()
+    overlap = 0
+    for ref_s in ref_words:
+        before = len(union)
+        ref_ids = as_ids(ref_s)
+        for hyp_s, hyp_i in zip(hyp_words, hyp_ids):
+            union |= _lcs_words(ref_s, hyp_s, ref_ids, hyp_i)
+        overlap += len(union) - before
+
+    r_lcs = overlap / m
+    p_lcs = overlap / n
+    return 2.0 * ((p_lcs * r_lcs) / (p_lcs + r_lcs + 1e-8))
+
+
+@lru_cache(maxsize=4096)
+def prepare_reference(normalized):
+    """Cached Reference for a normalized ground truth, shared across models and runs."""
+    return Reference(normalized)
+
+
+def score_normalized(ref_normalized, pred_normalized):
+    """BLEU, ROUGE-L and Levenshtein ratio (all in [0, 1]) for normalized reference/prediction text."""
+    reference = prepare_reference(ref_normalized)
+    return {
+        "BLEU": bleu(reference, re.findall(r"\w+", pred_normalized)),
+        "ROUGE-L": rouge_l(reference, pred_normalized),
+        "Levenshtein": levenshtein_ratio(pred_normalized, ref_normalized),
+    }
@@ -0,0 +1,167 @@
+import re
+from metrics import levenshtein_ratio
+
+FUZZ_THRESHOLD = 0.85  # similarity a block needs to match lines the model misremembered
+PATCH_TOKENS = 1024  # output budget for a patch; far below regenerating a whole file
+
+PATCH_INSTRUCTIONS = (
+    "Do not repeat the whole code. Return only the changes, as one or more search/replace blocks:\n"
+    "<<<<<<< SEARCH\n"
+    "(lines copied exactly from the original code, with their indentation)\n"
+    "=======\n"
+    "(the lines that replace them)\n"
+    ">>>>>>> REPLACE\n"
+    "Include just enough lines in each SEARCH part to identify the place uniquely. "
+    "A unified diff with @@ hunks is also accepted."
+)
+
+SEARCH_RE = re.compile(r"^<{5,9} ?SEARCH\s*$")
+DIVIDER_RE = re.compile(r"^={5,9}\s*$")
+REPLACE_RE = re.compile(r"^>{5,9} ?REPLACE\s*$")
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """The response holds no patch, or a block matches nothing in the source."""
+
+
+def parse_patch(text):
+    """Hunks of a search/replace or unified-diff response, as (search_lines, replace_lines, line_hint).
+
+    ``line_hint`` is the 0-based original line a unified-diff hunk starts at (None for search/replace).
+    A hunk runs for the line counts in its ``@@`` header, so a removed ``-- comment`` line is not
+    taken for a file header; past those counts it ends at the next header, hunk or code fence.
+    """
+    lines = (text or "").splitlines()
+    hunks = []
+    i = 0
+    while i < len(lines):
+        if SEARCH_RE.match(lines[i]):
+            search, replace, target = [], [], None
+            i += 1
+            while i < len(lines) and not REPLACE_RE.match(lines[i]):
+                if target is None and DIVIDER_RE.match(lines[i]):
+                    target = replace
+                else:
+                    (search if target is None else target).append(lines[i])
+                i += 1
+            if target is None or i == len(lines):
+                raise PatchError("Unterminated SEARCH/REPLACE block.")
+            hunks.append((search, replace, None))
+        elif HUNK_RE.match(lines[i]):
+            header = HUNK_RE.match(lines[i])
+            hint = max(0, int(header.group(1)) - 1)
+            old_left, new_left = int(header.group(2) or 1), int(header.group(3) or 1)
+            search, replace = [], []
+            i += 1
+            while i < len(lines):
+                line = lines[i]
+                # Models often miscount, so lines past the counts are still taken until something else starts
+                if old_left <= 0 and new_left <= 0 and (HUNK_RE.match(line) or line.startswith(("```", "--- ", "+++ "))):
+                    break
+                if line.startswith("-"):
+                    search.append(line[1:])
+                    old_left -= 1
+                elif line.startswith("+"):
+                    replace.append(line[1:])
+                    new_left -= 1
+                elif line.startswith(" ") or not line:
+                    search.append(line[1:])
+                    replace.append(line[1:])
+                    old_left -= 1
+                    new_left -= 1
+                elif not line.startswith("\\"):  # "\ No newline at end of file"
+                    break
+                i += 1
+            # Trailing blank context is usually an artifact of the surrounding markdown
+            while search and replace and search[-1] == replace[-1] == "":
+                search.pop()
+                replace.pop()
+            hunks.append((search, replace, hint))
+            continue
+        i += 1
+    if not hunks:
+        raise PatchError("No search/replace blocks or diff hunks found.")
+    return hunks
+
+
+def _squash(line):
+    return " ".join(line.split())
+
+
+def _locate(lines, search, cursor, hint):
+    """(index, kind) of the best place for ``search``: exact, then ignoring whitespace, then fuzzy."""
+    n = len(search)
+    starts = range(len(lines) - n + 1)
+    near = (lambda i: abs(i - hint)) if hint is not None else (lambda i: (i < cursor, abs(i - cursor)))
+    for kind, key in (("exact", lambda line: line), ("whitespace", _squash)):
+        wanted = [key(line) for line in search]
+        found = [i for i in starts if key(lines[i]) == wanted[0] and [key(l) for l in lines[i:i + n]] == wanted]
+        if found:
+            return min(found, key=near), kind
+    wanted = "\n".join(_squash(line) for line in search)
+    best, best_score = None, FUZZ_THRESHOLD
+    for i in starts:
+        score = levenshtein_ratio("\n".join(_squash(line) for line in lines[i:i + n]), wanted)
+        if score > best_score or (score == best_score and best is not None and near(i) < near(best)):
+            best, best_score = i, score
+    if best is None:
+        raise PatchError(f"No match for block starting {search[0].strip()!r}.")
+    return best, "fuzzy"
+
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(replace, search, matched):
+    """Shifts the replacement by the indentation difference between the block and the lines it matched."""
+    first = next((k for k, line in enumerate(search) if line.strip()), None)
+    if first is None:
+        return replace
+    have, want = _indent(search[first]), _indent(matched[first])
+    if have == want:
+        return replace
+    if want.startswith(have):
+        extra = want[len(have):]
+        return [extra + line if line.strip() else line for line in replace]
+    if have.startswith(want):
+        cut = len(have) - len(want)
+        return [line[cut:] if line[:cut].strip() == "" else line.lstrip() for line in replace]
+    return replace
+
+
+def apply_patch(source, patch_text):
+    """Applies a search/replace or unified-diff response to ``source``.
+
+    Blocks are matched exactly, then ignoring whitespace, then fuzzily (FUZZ_THRESHOLD), preferring
+    the place nearest the previous block or the hunk's line number. Returns (patched source,
+    list of match kinds per block); raises PatchError if any block cannot be placed.
+    """
+    lines = source.splitlines()
+    kinds = []
+    cursor, offset = 0, 0
+    for search, replace, hint in parse_patch(patch_text):
+        hint = None if hint is None else hint + offset
+        if not any(line.strip() for line in search):
+            if hint is None:
+                raise PatchError("A block has an empty SEARCH part and no line number.")
+            index, kind = min(hint, len(lines)), "insert"
+            search = []
+        else:
+            index, kind = _locate(lines, search, cursor, hint)
+            if kind != "exact":
+                replace = _reindent(replace, search, lines[index:index + len(search)])
+        lines[index:index + len(search)] = replace
+        cursor = index + len(replace)
+        offset += len(replace) - len(search)
+        kinds.append(kind)
+    return "\n".join(lines) + ("\n" if source.endswith("\n") else ""), kinds
+
+
+def try_apply(source, patch_text):
+    """(patched source, None) or (None, error message)."""
+    try:
+        return apply_patch(source, patch_text)[0], None
+    except PatchError as e:
+        return None, str(e)
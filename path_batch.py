@@ -0,0 +1,79 @@
+import os
+import re
+import json
+import token_budget
+
+BATCH_SIZE = int(os.getenv("CODEDOC_PATH_BATCH_SIZE", "25"))
+BATCH_PROMPT_TOKENS = 12000
+MAX_BODY_CHARS = 4000  # long logs rarely name the file after the first screenful
+ANSWER_TOKENS_PER_ISSUE = 40
+
+SYSTEM_PROMPT = (
+    "You are an AI that extracts file paths from GitHub issue descriptions. "
+    "You receive several issues, each introduced by a line `### Issue <id>`. For every issue, find the exact "
+    "GitHub file path or relative file path it mentions, and return only the path part, like 'src/main.py' or "
+    "'test/CMakeLists.txt'. Reply with a JSON object of the form "
+    '{"paths": {"<id>": "<path>", ...}} with one entry per issue id, using null when an issue names no file.'
+)
+
+
+def _issue_block(key, body):
+    body = body or ""
+    if len(body) > MAX_BODY_CHARS:
+        body = body[:MAX_BODY_CHARS] + "\n[...]"
+    return f"### Issue {key}\n{body}\n"
+
+
+def batch_messages(batch):
+    """Chat messages for one batch of (key, body) pairs."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Extract the file path of each issue.\n\n" + "\n".join(_issue_block(k, b) for k, b in batch)},
+    ]
+
+
+def pack_batches(items, model, max_items=BATCH_SIZE, max_prompt_tokens=BATCH_PROMPT_TOKENS):
+    """Greedily groups (key, body) pairs into batches that fit the model and the batch limits."""
+    capacity = token_budget.prompt_capacity(model, max_items * ANSWER_TOKENS_PER_ISSUE)
+    limit = min(max_prompt_tokens, capacity)
+    base = token_budget.count_messages(batch_messages([]), model)
+    batches, current, used = [], [], base
+    for key, body in items:
+        cost = token_budget.count_tokens(_issue_block(key, body), model) + 1
+        if current and (len(current) >= max_items or used + cost > limit):
+            batches.append(current)
+            current, used = [], base
+        current.append((key, body))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(text, keys):
+    """Maps each key to the returned path string, None (no file named) or a missing entry.
+
+    Keys the model skipped or answered with something other than a string/null are left out,
+    so the caller can retry them one by one.
+    """
+    text = (text or "").strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    paths = data.get("paths", data) if isinstance(data, dict) else {}
+    if not isinstance(paths, dict):
+        return {}
+    answers = {}
+    for key in keys:
+        value = paths.get(str(key))
+        if value is None and str(key) in paths:
+            answers[key] = None
+        elif isinstance(value, str):
+            value = value.strip()
+            answers[key] = None if value.lower() in ("", "not there", "none", "null") else value
+    return answers
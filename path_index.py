@@ -0,0 +1,154 @@
+import re
+import sys
+import threading
+from array import array
+from collections import defaultdict
+from difflib import SequenceMatcher
+from repo_tree import RepoTree, PackedStrings, bisect
+
+BLOB_URL_RE = re.compile(r"https://github\.com/[^/]+/[^/]+/blob/[^/]+/([^\s`'\"#)>\]]+)")
+PATH_TOKEN_RE = re.compile(r"(?<![\w/.-])((?:[\w.-]+/)*[\w-][\w.-]*\.[A-Za-z0-9]+)(?::\d+)?")
+NGRAM = 3
+
+
+def _ngrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class PathIndex:
+    """Lookup tables over a repo's file list: exact, basename, path-suffix and trigram matches.
+
+    Built once per (repo, branch) over a RepoTree. Lowercased paths are packed into one buffer
+    and the tables are arrays of path ids: sorted for exact lookups, sorted by reversed path for
+    basename and suffix lookups, and one posting array per trigram. Every lookup is a binary
+    search or a handful of dict probes instead of a scan over all files.
+    """
+
+    def __init__(self, repo_files):
+        self.tree = repo_files if isinstance(repo_files, RepoTree) else RepoTree((path, None) for path in repo_files)
+        self.fingerprint = self.tree.fingerprint
+        self.lowered = PackedStrings(path.lower().strip() for path in self.tree)
+        raw = self.lowered.raw
+        ids = range(len(self.lowered))
+        self.by_path = array("I", sorted(ids, key=raw))
+        self.by_reversed = array("I", sorted(ids, key=lambda i: raw(i)[::-1]))
+        by_ngram = defaultdict(lambda: array("I"))
+        for i in ids:
+            for gram in _ngrams(self.lowered[i]):
+                by_ngram[gram].append(i)
+        self.by_ngram = dict(by_ngram)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def nbytes(self):
+        """Approximate memory held by the index, including its RepoTree."""
+        arrays = sys.getsizeof(self.by_path) + sys.getsizeof(self.by_reversed)
+        grams = sys.getsizeof(self.by_ngram) + sum(sys.getsizeof(g) + sys.getsizeof(ids) for g, ids in self.by_ngram.items())
+        return self.tree.nbytes() + self.lowered.nbytes() + arrays + grams
+
+    def _exact(self, candidate):
+        key = candidate.encode("utf-8")
+        get = lambda k: self.lowered.raw(self.by_path[k])
+        k = bisect(get, len(self.by_path), key)
+        return self.by_path[k] if k < len(self.by_path) and get(k) == key else None
+
+    def _ending_with(self, candidate):
+        """Ids of paths that are ``candidate`` or end with ``/candidate``, in tree order."""
+        key = candidate.encode("utf-8")
+        get = lambda k: self.lowered.raw(self.by_reversed[k])[::-1]
+        k = bisect(get, len(self.by_reversed), key[::-1])
+        found = []
+        while k < len(self.by_reversed):
+            path = self.lowered.raw(self.by_reversed[k])
+            if not path.endswith(key):
+                break
+            if len(path) == len(key) or path[-len(key) - 1] == ord("/"):
+                found.append(self.by_reversed[k])
+            k += 1
+        return sorted(found)
+
+    def lookup(self, candidate, n=5, cutoff=0.6):
+        """Returns up to ``n`` ranked (path, score, kind) matches for a path-like string."""
+        candidate = re.sub(r"^(?:\./)+", "", candidate.strip().strip("`'\"")).lower()
+        if not candidate:
+            return []
+        exact = self._exact(candidate)
+        if exact is not None:
+            return [(self.tree.path(exact), 1.0, "exact")]
+
+        ids = self._ending_with(candidate)
+        if ids:
+            kind = "suffix" if "/" in candidate else "basename"
+            score = 0.95 if len(ids) == 1 else 0.9 / len(ids)
+            return [(self.tree.path(i), score, kind) for i in ids[:n]]
+
+        return self.fuzzy(candidate, n, cutoff)
+
+    def fuzzy(self, candidate, n=5, cutoff=0.6, shortlist=50):
+        """Trigram shortlist, then difflib ratio on the shortlist only (same cutoff as before).
+
+        Trigrams shared by a large share of the repo (``.py``, ``src``) are skipped; they do
+        not discriminate and would turn the shortlist back into a full scan.
+        """
+        grams = _ngrams(candidate)
+        common = max(1000, len(self) // 20)
+        postings = [self.by_ngram[gram] for gram in grams if gram in self.by_ngram]
+        selective = [ids for ids in postings if len(ids) <= common] or sorted(postings, key=len)[:1]
+        counts = defaultdict(int)
+        for ids in selective:
+            for i in ids:
+                counts[i] += 1
+        best = sorted(counts.items(), key=lambda item: -item[1])[:shortlist]
+        depth = candidate.count("/") + 1
+        scored = []
+        for i, _ in best:
+            lowered = self.lowered[i]
+            tail = "/".join(lowered.split("/")[-depth:])
+            ratio = max(
+                SequenceMatcher(None, candidate, lowered).ratio(),
+                SequenceMatcher(None, candidate, tail).ratio(),
+            )
+            if ratio >= cutoff:
+                scored.append((self.tree.path(i), ratio, "fuzzy"))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:n]
+
+    def match_text(self, text):
+        """Deterministic pre-pass: returns a path when the text names exactly one repo file.
+
+        Blob URLs and path-like tokens are looked up directly; the LLM is only needed when this
+        finds nothing, or finds several different files.
+        """
+        if not text:
+            return None
+        found = set()
+        for match in BLOB_URL_RE.finditer(text):
+            hits = self.lookup(match.group(1), n=2, cutoff=1.0)
+            if len(hits) == 1 and hits[0][2] != "fuzzy":
+                return hits[0][0]
+        for match in PATH_TOKEN_RE.finditer(text):
+            token = match.group(1)
+            hits = self.lookup(token, n=2, cutoff=1.0)
+            if len(hits) == 1 and hits[0][1] >= 0.95:
+                found.add(hits[0][0])
+        return found.pop() if len(found) == 1 else None
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+def get_path_index(owner, repo, branch, repo_files):
+    """Returns the index for (owner, repo, branch), building it on first use or if the file list changed.
+
+    ``repo_files`` is a RepoTree, or any iterable of paths.
+    """
+    key = (owner, repo, branch)
+    tree = repo_files if isinstance(repo_files, RepoTree) else RepoTree((path, None) for path in repo_files)
+    with _lock:
+        index = _indexes.get(key)
+        if index is None or index.fingerprint != tree.fingerprint:
+            index = PathIndex(tree)
+            _indexes[key] = index
+        return index
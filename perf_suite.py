@@ -0,0 +1,221 @@
+"""End-to-end throughput benchmark of the three apps against the local stand-in services.
+
+    python perf_suite.py --issues 100 --files 2000 --samples 50 --output perf.json
+    python perf_suite.py --scenarios main --latency 0.2 --error-rate 0.05 --groq-rpm 600
+
+Each app runs headlessly (Streamlit's AppTest) in its own process, with a fresh cache directory
+and fake credentials, against standin.py. Reports items/sec, p50/p95 per-item latency and peak
+memory; exits non-zero if a scenario fails, so it can gate CI without network access.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from telemetry import percentile
+from standin import StandinConfig, StandinServer, SyntheticRepo, write_bug_corpus, write_review_samples
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ("main", "ift", "inference")
+UNITS = {"main": "issues", "ift": "fixes", "inference": "samples"}  # IFT scores every model on every sample
+OWNER, REPO = "codedoc", "synthetic"
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latencies(run, stage):
+    """Per-item seconds of a stage, summing spans that share an item (e.g. one sample across retries)."""
+    per_item, unkeyed = {}, []
+    for span in run.spans:
+        if span["stage"] != stage:
+            continue
+        if span.get("item") is None:
+            unkeyed.append(span["seconds"])
+        else:
+            key = (span["item"], span.get("model"))
+            per_item[key] = per_item.get(key, 0.0) + span["seconds"]
+    return sorted(list(per_item.values()) + unkeyed)
+
+
+def _check(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def drive_main(args):
+    at = _check(_app("main.py", args).run())
+    at.text_input[0].set_value(f"https://github.com/{OWNER}/{REPO}")
+    at.radio[0].set_value("main")
+    at.slider[0].set_value(args.workers)
+    at.checkbox[0].set_value(args.stream)
+    _check(at.run())
+    for _ in range(2 if args.warm else 1):
+        started = time.perf_counter()
+        _check(at.button[0].click().run())
+        seconds = time.perf_counter() - started
+    last_run = at.session_state["last_run"]
+    errors = sum(1 for r in last_run["results"].values() if not r["fix"])
+    return len(last_run["results"]), errors, seconds, latencies(last_run["run"], "issue")
+
+
+def drive_ift(args):
+    at = _check(_app("IFT.py", args).run())
+    at.text_input[0].set_value("file://" + os.path.join(args.data, "corpus.git"))
+    at.checkbox[0].set_value(args.stream)
+    at.number_input[0].set_value(args.samples)
+    at.slider[0].set_value(min(16, args.workers))
+    _check(at.run())
+    for _ in range(2 if args.warm else 1):
+        started = time.perf_counter()
+        _check(at.button[0].click().run())
+        seconds = time.perf_counter() - started
+    last_run = at.session_state["ift_run"]
+    records = last_run["records"]
+    return len(records), sum(1 for r in records if r["error"]), seconds, latencies(last_run["run"], "llm")
+
+
+def drive_inference(args):
+    at = _check(_app("inference.py", args).run())
+    with open(os.path.join(args.data, "reviews.jsonl"), "rb") as f:
+        at.file_uploader[0].set_value(("reviews.jsonl", f.read(), "application/jsonl"))
+    at.checkbox[0].set_value(args.stream)
+    at.slider[0].set_value(min(64, args.workers))
+    _check(at.run())
+    for _ in range(2 if args.warm else 1):
+        started = time.perf_counter()
+        _check(at.button[0].click().run())
+        seconds = time.perf_counter() - started
+    last_run = at.session_state["eval_run"]
+    return len(last_run["results"]), args.samples - len(last_run["results"]), seconds, latencies(last_run["run"], "llm")
+
+
+def _app(script, args):
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(os.path.join(HERE, script), default_timeout=args.timeout)
+
+
+DRIVERS = {"main": drive_main, "ift": drive_ift, "inference": drive_inference}
+
+
+def run_child(args):
+    """Runs one scenario in this process and prints its result as a JSON line."""
+    items, errors, seconds, spans = DRIVERS[args.child](args)
+    print(json.dumps({
+        "scenario": args.child,
+        "items": items,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "per_sec": round(items / seconds, 2) if seconds else None,
+        "p50 (s)": round(percentile(spans, 0.5), 3),
+        "p95 (s)": round(percentile(spans, 0.95), 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+    return 0
+
+
+def prepare_data(directory, samples, seed):
+    """Sample corpus as a local bare git repo (for IFT's clone cache) and the review JSONL for inference.py."""
+    work = os.path.join(directory, "corpus")
+    write_bug_corpus(work, samples, seed)
+    git = lambda *a, cwd=work: subprocess.run(["git", *a], cwd=cwd, check=True, capture_output=True)
+    git("init", "-q")
+    git("add", ".")
+    git("-c", "user.name=perf", "-c", "user.email=perf@localhost", "commit", "-q", "-m", "corpus")
+    git("clone", "-q", "--bare", work, os.path.join(directory, "corpus.git"), cwd=directory)
+    git("config", "uploadpack.allowFilter", "true", cwd=os.path.join(directory, "corpus.git"))
+    write_review_samples(os.path.join(directory, "reviews.jsonl"), samples, seed)
+
+
+def child_env(server_url, directory, scenario):
+    env = dict(os.environ)
+    env.update({
+        "CODEDOC_GITHUB_API_URL": server_url,
+        "GROQ_BASE_URL": server_url,
+        "GITHUB_PAT": "standin", "GROQ_API_KEY": "standin", "ANOTHER_LLM_API_KEY": "standin",
+        "CODEDOC_CACHE_DIR": os.path.join(directory, f"cache-{scenario}"),
+        "NO_PROXY": "127.0.0.1,localhost", "no_proxy": "127.0.0.1,localhost",
+    })
+    # The stand-in enforces its own limits (--groq-rpm, --github-limit); the client-side ones would dominate
+    env.setdefault("CODEDOC_GROQ_RPM", "100000")
+    env.setdefault("CODEDOC_GITHUB_RPS", "10000")
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CodeDoc apps end to end against local stand-ins.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--issues", type=int, default=40, help="open issues in the synthetic repo")
+    parser.add_argument("--files", type=int, default=500, help="files in the synthetic repo")
+    parser.add_argument("--samples", type=int, default=40, help="samples for the IFT and inference evaluators")
+    parser.add_argument("--workers", type=int, default=8, help="concurrency setting passed to each app")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--warm", action="store_true", help="measure a second run with warm caches")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--tokens-per-sec", type=float, default=800)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-rpm", type=int, default=0)
+    parser.add_argument("--github-limit", type=int, default=5000)
+    parser.add_argument("--tree-limit", type=int, default=100_000, help="entries per tree listing before it is truncated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per scenario")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(args)
+
+    config = StandinConfig(args.latency, args.jitter, args.tokens_per_sec, args.error_rate, args.groq_rpm,
+                           args.github_limit, args.seed, args.tree_limit)
+    repo = SyntheticRepo(OWNER, REPO, args.files, args.issues, seed=args.seed)
+    results, failed = [], False
+    with tempfile.TemporaryDirectory(prefix="codedoc-perf-") as directory, StandinServer([repo], config) as server:
+        prepare_data(directory, args.samples, args.seed)
+        for scenario in args.scenarios:
+            before = server.requests_served()
+            command = [sys.executable, os.path.abspath(__file__), *(argv if argv is not None else sys.argv[1:]),
+                       "--child", scenario, "--data", directory]
+            try:
+                done = subprocess.run(command, env=child_env(server.url, directory, scenario), cwd=HERE,
+                                      capture_output=True, text=True, timeout=args.timeout + 60)
+                lines = done.stdout.strip().splitlines()
+                if done.returncode != 0 or not lines:
+                    raise RuntimeError(done.stderr.strip().splitlines()[-1] if done.stderr.strip() else f"exit {done.returncode}")
+                result = json.loads(lines[-1])
+            except Exception as e:
+                failed = True
+                result = {"scenario": scenario, "error": str(e)}
+            after = server.requests_served()
+            result["server_requests"] = {k: after[k] - before.get(k, 0) for k in after if after[k] != before.get(k, 0)}
+            results.append(result)
+            print(format_result(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k not in ("child", "data", "output")},
+                       "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+def format_result(result):
+    if "error" in result:
+        return f"❌ {result['scenario']}: {result['error']}"
+    unit = UNITS[result["scenario"]]
+    rss = f"{result['peak_rss_mb']} MB" if result["peak_rss_mb"] is not None else "n/a"
+    return (f"{result['scenario']:<10} {result['items']} {unit} ({result['errors']} failed) in {result['seconds']:.2f}s · "
+            f"{result['per_sec']} {unit}/s · p50 {result['p50 (s)']:.3f}s · p95 {result['p95 (s)']:.3f}s · peak RSS {rss}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
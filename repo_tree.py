@@ -0,0 +1,219 @@
+"""Compact file listing of a repository branch, and a loader that copes with truncated git trees.
+
+    python repo_tree.py --files 100000    # measures memory per 100k files
+"""
+import os
+import sys
+import random
+import hashlib
+import argparse
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import github_api
+import telemetry
+
+TREE_WORKERS = int(os.getenv("CODEDOC_TREE_WORKERS", "8"))  # concurrent subtree requests for truncated trees
+
+
+def bisect(get, size, key):
+    """First position in ``0..size`` whose ``get(position)`` is >= ``key``; ``get`` must be sorted."""
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if get(mid) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class PackedStrings:
+    """Strings stored UTF-8 encoded back to back in one buffer, addressed by an array of offsets.
+
+    About 4 bytes of overhead per string, against ~50 for a ``str`` object plus its list slot.
+    """
+
+    def __init__(self, strings):
+        self.offsets = array("I", [0])
+        buffer = bytearray()
+        for s in strings:
+            buffer += s.encode("utf-8")
+            self.offsets.append(len(buffer))
+        self.buffer = bytes(buffer)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        return self.raw(i).decode("utf-8")
+
+    def nbytes(self):
+        return sys.getsizeof(self.buffer) + sys.getsizeof(self.offsets)
+
+
+class RepoTree(Mapping):
+    """Read-only map of every file path in a branch to its blob SHA (None if unknown).
+
+    Paths are kept sorted in a PackedStrings and SHAs as raw bytes in a second buffer, so lookups
+    are a binary search and prefix queries a contiguous range. ``complete`` is False when part of
+    the tree could not be fetched.
+    """
+
+    def __init__(self, entries=(), complete=True):
+        # str order is code point order, which is also the order of the UTF-8 encoded paths
+        pairs = sorted(dict(entries).items())
+        self.paths = PackedStrings(p for p, _ in pairs)
+        self.sha_size = max((len(sha) for _, sha in pairs if sha), default=40) // 2
+        shas = bytearray()
+        for _, sha in pairs:
+            shas += bytes.fromhex(sha) if sha else bytes(self.sha_size)
+        self.shas = bytes(shas)
+        self.complete = complete
+        digest = hashlib.blake2b(self.paths.buffer, digest_size=16)
+        digest.update(self.paths.offsets.tobytes())
+        self.fingerprint = digest.hexdigest()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        return (self.paths[i] for i in range(len(self.paths)))
+
+    def path(self, i):
+        return self.paths[i]
+
+    def position(self, path):
+        """Index of ``path`` in sorted order, or -1."""
+        raw = path.encode("utf-8")
+        i = bisect(self.paths.raw, len(self.paths), raw)
+        return i if i < len(self.paths) and self.paths.raw(i) == raw else -1
+
+    def __getitem__(self, path):
+        i = self.position(path)
+        if i < 0:
+            raise KeyError(path)
+        sha = self.shas[i * self.sha_size:(i + 1) * self.sha_size]
+        return sha.hex() if any(sha) else None
+
+    def with_prefix(self, prefix):
+        """Yields the paths starting with ``prefix`` (e.g. a directory, ``src/``), in sorted order."""
+        raw = prefix.encode("utf-8")
+        i = bisect(self.paths.raw, len(self.paths), raw)
+        while i < len(self.paths) and self.paths.raw(i).startswith(raw):
+            yield self.paths[i]
+            i += 1
+
+    def with_extension(self, *extensions):
+        """Yields the paths ending in any of ``extensions`` (``".py"``), ignoring case."""
+        suffixes = tuple(ext.lower().encode("utf-8") for ext in extensions)
+        for i in range(len(self.paths)):
+            if self.paths.raw(i).lower().endswith(suffixes):
+                yield self.paths[i]
+
+    def nbytes(self):
+        return self.paths.nbytes() + sys.getsizeof(self.shas)
+
+
+def _blobs(entries, prefix):
+    return [(prefix + e["path"], e.get("sha")) for e in entries if e.get("type") == "blob"]
+
+
+def _expand(owner, repo, sha, prefix, token, recursive, run):
+    """(blobs, subtrees still to expand, complete) for one tree.
+
+    Takes the recursive listing when GitHub returns it whole; otherwise lists the tree's direct
+    entries and hands its subdirectories back, to be expanded the same way.
+    """
+    with telemetry.activate(run), telemetry.stage("subtree_fetch", item=prefix or "/"):
+        data = github_api.fetch_tree(owner, repo, sha, token, recursive)
+        if recursive and data.get("truncated"):
+            data = github_api.fetch_tree(owner, repo, sha, token, recursive=False)
+            recursive = False
+    if not data:
+        return [], [], False
+    entries = data.get("tree", [])
+    subtrees = [] if recursive else [(f"{prefix}{e['path']}/", e["sha"]) for e in entries if e.get("type") == "tree"]
+    # A directory with more direct entries than GitHub lists in one response stays truncated
+    return _blobs(entries, prefix), subtrees, not data.get("truncated")
+
+
+def load_repo_tree(owner, repo, branch, token, max_workers=TREE_WORKERS, run=None):
+    """Every file of a branch as a RepoTree.
+
+    GitHub cuts recursive tree listings off at about 100k entries and sets ``truncated``. In that
+    case the root is listed on its own and each subdirectory is fetched recursively in parallel,
+    splitting further wherever a subtree is still too large. Subtree responses are cached like any
+    other GitHub response, so reloading an unchanged monorepo costs only conditional requests.
+    """
+    data = github_api.fetch_repo_tree(owner, repo, branch, token)
+    if not data or not data.get("truncated"):
+        return RepoTree(_blobs(data.get("tree", []), ""), complete=bool(data))
+    telemetry.count("truncated_trees")
+    entries, complete = [], True
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {executor.submit(_expand, owner, repo, data["sha"], "", token, False, run)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                blobs, subtrees, whole = future.result()
+                entries.extend(blobs)
+                complete = complete and whole
+                pending |= {executor.submit(_expand, owner, repo, sha, prefix, token, True, run) for prefix, sha in subtrees}
+    return RepoTree(entries, complete)
+
+
+def synthetic_paths(files, seed=0):
+    """Monorepo-like paths (3-8 levels deep, a few hundred distinct directory names)."""
+    rng = random.Random(seed)
+    words = ["src", "main", "java", "lib", "core", "test", "utils", "api", "services", "internal", "web", "common"]
+    words += [f"module{i}" for i in range(200)]
+    extensions = [".py", ".java", ".js", ".ts", ".go", ".md", ".json"]
+    return [
+        "/".join(rng.choice(words) for _ in range(rng.randint(2, 7))) + f"/file_{i}{rng.choice(extensions)}"
+        for i in range(files)
+    ]
+
+
+def measure(files, seed=0):
+    """Retained bytes per 100k files: a plain {path: sha} dict, this RepoTree, and a PathIndex over it."""
+    import tracemalloc
+    from path_index import PathIndex
+
+    def entries():
+        # Fresh strings on every call, as if decoded from the tree response
+        rng = random.Random(seed)
+        return [(path, "%040x" % rng.getrandbits(160)) for path in synthetic_paths(files, seed)]
+
+    results = {}
+    for name, build in (
+        ("dict", lambda: dict(entries())),
+        ("RepoTree", lambda: RepoTree(entries())),
+        ("RepoTree+PathIndex", lambda: PathIndex(RepoTree(entries()))),
+    ):
+        tracemalloc.start()
+        built = build()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        scale = 100_000 / files
+        results[name] = {"MB per 100k files": round(retained * scale / 2**20, 1),
+                         "peak MB per 100k files": round(peak * scale / 2**20, 1)}
+        del built
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the memory of a repository file listing.")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for name, row in measure(args.files, args.seed).items():
+        print(f"{name:<20} {row['MB per 100k files']:>7} MB retained · {row['peak MB per 100k files']:>7} MB peak")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import queue
+import threading
+from fpdf import FPDF
+from disk_cache import CACHE_DIR
+
+REPORT_DIR = os.path.join(CACHE_DIR, "reports")
+REPORT_QUEUE_SIZE = 32
+# FPDF keeps every page in memory until output(), so long fixes are cut to bound the report's size
+REPORT_CODE_LINES = int(os.getenv("CODEDOC_REPORT_CODE_LINES", "200"))
+_DONE = object()
+_CANCEL = object()
+
+
+def latin1(text):
+    """The core PDF fonts only cover Latin-1; anything else is replaced rather than failing."""
+    text = (text or "").replace("\t", "    ").replace("\r\n", "\n")
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+class ReportPDF(FPDF):
+    def __init__(self, title):
+        super().__init__()
+        self.report_title = latin1(title)
+        self.alias_nb_pages()
+        self.set_auto_page_break(True, margin=15)
+
+    def header(self):
+        self.set_font("Arial", "B", 9)
+        self.set_text_color(120, 120, 120)
+        self.cell(0, 6, self.report_title, 0, 1, "R")
+        self.set_text_color(0, 0, 0)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 6, f"Page {self.page_no()}/{{nb}}", 0, 0, "C")
+
+
+def _clip(code):
+    lines = (code or "").splitlines()
+    if len(lines) <= REPORT_CODE_LINES:
+        return code
+    return "\n".join(lines[:REPORT_CODE_LINES] + [f"... {len(lines) - REPORT_CODE_LINES} more lines, see the app"])
+
+
+class ReportWriter:
+    """Builds the fix report on a background thread, one issue at a time as results arrive.
+
+    Only the sections that go into the PDF are queued (not the whole result), the queue is
+    bounded, and long code blocks flow across pages with FPDF's automatic page breaks.
+    Issues appear in the order they finish; headings carry the UI index and GitHub number.
+    Either ``close()`` or ``cancel()`` must be called, or the writer thread waits forever.
+    """
+
+    def __init__(self, title, path=None):
+        self.title = title
+        if path is None:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            slug = re.sub(r"[^\w.-]+", "-", title).strip("-")
+            path = os.path.join(REPORT_DIR, f"{slug}-{time.strftime('%Y%m%d-%H%M%S')}.pdf")
+        self.path = path
+        self.issues = 0
+        self.error = None
+        self._finished = False
+        self._queue = queue.Queue(maxsize=REPORT_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, idx, issue, result):
+        """Queues one finished issue; blocks only if the writer falls far behind."""
+        fix = result.get("fix") or {}
+        self._queue.put({
+            "heading": f"Issue {idx+1}" + (f" (#{issue['number']})" if issue.get("number") else "")
+                       + f": {issue.get('title', '')}",
+            "file_path": result.get("file_path"),
+            "language": result.get("language"),
+            "root_cause": fix.get("Root Cause"),
+            "fixed_code": _clip(fix.get("Fixed Code")),
+            "explanation": fix.get("Explanation"),
+        })
+
+    def close(self):
+        """Finishes the document and returns its path (None if writing failed)."""
+        self._finished = True
+        self._queue.put(_DONE)
+        self._thread.join()
+        return None if self.error else self.path
+
+    def cancel(self):
+        """Stops the writer without producing a file; does nothing after ``close()``."""
+        if self._finished:
+            return
+        self._finished = True
+        self._queue.put(_CANCEL)
+
+    def _run(self):
+        pdf = ReportPDF(self.title)
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 16)
+        pdf.multi_cell(0, 9, latin1(self.title))
+        pdf.set_font("Arial", "", 10)
+        pdf.cell(0, 6, time.strftime("Generated %Y-%m-%d %H:%M"), 0, 1)
+        while True:
+            entry = self._queue.get()
+            if entry is _CANCEL:
+                return  # drops the partial document
+            if entry is _DONE:
+                break
+            if self.error:
+                continue  # keep draining so producers never block
+            try:
+                self._write_issue(pdf, entry)
+                self.issues += 1
+            except Exception as e:
+                self.error = e
+        if not self.error:
+            try:
+                pdf.output(self.path, "F")
+            except Exception as e:
+                self.error = e
+
+    @staticmethod
+    def _write_issue(pdf, entry):
+        pdf.ln(4)
+        pdf.set_font("Arial", "B", 13)
+        pdf.multi_cell(0, 7, latin1(entry["heading"]))
+        pdf.set_font("Arial", "", 10)
+        if not entry["file_path"]:
+            pdf.multi_cell(0, 5, "No valid file path found.")
+            return
+        pdf.multi_cell(0, 5, latin1(f"File: {entry['file_path']} ({entry['language']})"))
+        if entry["root_cause"] is None:
+            pdf.multi_cell(0, 5, "No fix was generated.")
+            return
+        for label, key in (("Root Cause", "root_cause"), ("Fixed Code", "fixed_code"), ("Explanation", "explanation")):
+            pdf.ln(2)
+            pdf.set_font("Arial", "B", 11)
+            pdf.cell(0, 6, label, 0, 1)
+            if key == "fixed_code":
+                pdf.set_font("Courier", "", 8)
+                pdf.set_fill_color(245, 245, 245)
+                pdf.multi_cell(0, 4, latin1(entry[key]), 0, "L", True)
+            else:
+                pdf.set_font("Arial", "", 10)
+                pdf.multi_cell(0, 5, latin1(entry[key]))
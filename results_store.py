@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from disk_cache import CACHE_DIR
+
+RESULTS_DB = os.getenv("CODEDOC_RESULTS_DB", os.path.join(CACHE_DIR, "results.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    issue_updated_at TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    model TEXT NOT NULL,  -- fix model configuration; a row made under another one is stale
+    language TEXT,
+    fix_json TEXT NOT NULL,
+    merged_code TEXT,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (owner, repo, branch, issue_number)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+);
+"""
+# Columns added after the first release, appended to existing databases on open
+ADDED_COLUMNS = (
+    ("fix_model", "TEXT"),  # the model that actually answered, after routing and hedging
+    ("context_json", "TEXT"),  # the (name, start, end) regions of the file the model was sent
+)
+
+
+class ResultsStore:
+    """SQLite store of processed issues: resolved path, blob SHA, answering model, context regions and fix sections.
+
+    File contents live in a separate table keyed by blob SHA, so issues that point at the same
+    file share one copy.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+            for name, kind in ADDED_COLUMNS:
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE results ADD COLUMN {name} {kind}")
+
+    def get(self, owner, repo, branch, issue_number):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT issue_updated_at, file_path, blob_sha, model, fix_model, language, context_json, fix_json, "
+                "merged_code, content "
+                "FROM results LEFT JOIN blobs ON blobs.sha = results.blob_sha "
+                "WHERE owner = ? AND repo = ? AND branch = ? AND issue_number = ?",
+                (owner, repo, branch, issue_number),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("issue_updated_at", "file_path", "blob_sha", "model", "fix_model", "language", "context", "fix",
+                "merged_code", "code")
+        record = dict(zip(keys, row))
+        record["fix"] = json.loads(record["fix"])
+        record["context"] = json.loads(record["context"]) if record["context"] else None
+        return record
+
+    def put(self, owner, repo, branch, issue_number, issue_updated_at, file_path, blob_sha, model, fix_model,
+            language, code, context, fix, merged_code):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO blobs (sha, content) VALUES (?, ?)", (blob_sha, code))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (owner, repo, branch, issue_number, issue_updated_at, file_path, "
+                "blob_sha, model, fix_model, language, context_json, fix_json, merged_code, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner, repo, branch, issue_number, issue_updated_at, file_path, blob_sha, model, fix_model, language,
+                 json.dumps(context), json.dumps(fix), merged_code, time.time()),
+            )
+
+    def prune_blobs(self):
+        """Drops file contents no stored result refers to any more."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blobs WHERE sha NOT IN (SELECT blob_sha FROM results)")
+
+    def for_repo(self, owner, repo, branch, blob_shas, model):
+        return RepoResults(self, owner, repo, branch, blob_shas, model)
+
+
+class RepoResults:
+    """The store as seen by one run: a repository branch, its current blob SHAs and the fix model configuration."""
+
+    def __init__(self, store, owner, repo, branch, blob_shas, model):
+        self.store = store
+        self.owner, self.repo, self.branch = owner, repo, branch
+        self.blob_shas = blob_shas
+        self.model = model
+
+    def fresh(self, issue):
+        """The stored record if neither the issue, the file it resolved to, nor the model configuration changed."""
+        if issue.get("number") is None:
+            return None
+        record = self.store.get(self.owner, self.repo, self.branch, issue["number"])
+        if record is None or record["code"] is None:
+            return None
+        if record["issue_updated_at"] != issue.get("updated_at") or record["model"] != self.model:
+            return None
+        if self.blob_shas.get(record["file_path"]) != record["blob_sha"]:
+            return None
+        return record
+
+    def save(self, issue, result):
+        blob_sha = self.blob_shas.get(result["file_path"])
+        if issue.get("number") is None or not issue.get("updated_at") or not blob_sha:
+            return
+        # Unusable answers are not kept, so the next run asks again
+        if not result["fix"] or result["fix"]["Fixed Code"] == "Not Found":
+            return
+        self.store.put(
+            self.owner, self.repo, self.branch, issue["number"], issue["updated_at"], result["file_path"],
+            blob_sha, self.model, result["model"], result["language"], result["buggy_code"],
+            result["context"].regions if result["context"] is not None else None, result["fix"], result["merged_code"],
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_results_store():
+    """Returns the process-wide results store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+        return _store
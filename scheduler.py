@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import random
+import threading
+import telemetry
+
+GITHUB_RPS = float(os.getenv("CODEDOC_GITHUB_RPS", "10"))
+GROQ_RPM = float(os.getenv("CODEDOC_GROQ_RPM", "30"))
+MAX_ATTEMPTS = int(os.getenv("CODEDOC_MAX_ATTEMPTS", "4"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+LOW_QUOTA = 0.05  # share of a quota left when requests start being spread out until its reset
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` requests per second on average, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.server_rate = None  # pace reported by the server's quota headers, until server_rate_until
+        self.server_rate_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self.rate
+                if self.server_rate is not None and now < self.server_rate_until:
+                    rate = min(rate, self.server_rate)
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / rate)
+            time.sleep(wait)
+
+    def pace(self, remaining, reset_seconds):
+        """Spreads the ``remaining`` requests of the server's quota evenly until it resets."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens, remaining)
+            self.server_rate = max(remaining, 1) / reset_seconds
+            self.server_rate_until = now + reset_seconds
+
+    def pause_until(self, deadline):
+        """Blocks every caller until ``deadline`` (monotonic clock), e.g. when the quota is spent."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, deadline)
+
+
+def parse_duration(value):
+    """Parses Groq-style reset values such as ``"7.66s"``, ``"2m59.56s"`` or ``"250ms"`` into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+def retry_after(headers):
+    """Seconds the server asked us to wait, from ``Retry-After`` or rate-limit reset headers."""
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in headers.items()}
+    if "retry-after" in headers:
+        return parse_duration(headers["retry-after"])
+    if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        return max(0.0, float(headers["x-ratelimit-reset"]) - time.time())  # GitHub: epoch seconds
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            return parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+    return None
+
+
+def quota(headers):
+    """(requests remaining, seconds to their reset, seconds to wait for a nearly spent token quota).
+
+    Reads GitHub's ``X-RateLimit-*`` and Groq's ``x-ratelimit-*-requests``/``-tokens`` headers.
+    Requests are only reported once fewer than LOW_QUOTA of them are left, so bursts run at full
+    speed while the quota is healthy; each value is None when there is nothing to act on.
+    """
+    if not headers:
+        return None, None, None
+    headers = {k.lower(): v for k, v in headers.items()}
+    remaining = reset = token_wait = None
+    try:
+        if "x-ratelimit-remaining-requests" in headers:
+            limit = int(headers.get("x-ratelimit-limit-requests", 0))
+            remaining = int(headers["x-ratelimit-remaining-requests"])
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        elif "x-ratelimit-remaining" in headers and "x-ratelimit-reset" in headers:
+            limit = int(headers.get("x-ratelimit-limit", 0))
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset = max(0.0, float(headers["x-ratelimit-reset"]) - time.time())  # GitHub: epoch seconds
+        if remaining is not None and remaining > LOW_QUOTA * limit:
+            remaining = reset = None
+        if "x-ratelimit-remaining-tokens" in headers and "x-ratelimit-limit-tokens" in headers:
+            if int(headers["x-ratelimit-remaining-tokens"]) < LOW_QUOTA * int(headers["x-ratelimit-limit-tokens"]):
+                token_wait = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+    except ValueError:
+        remaining = reset = None
+    return remaining, reset, token_wait
+
+
+def backoff_delay(attempt, hint=None):
+    """Full-jitter exponential backoff, never shorter than the server's hint."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, hint or 0.0)
+
+
+class Scheduler:
+    """Shared throttle for all GitHub and Groq traffic: one bucket per (provider, model)."""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.buckets = {}
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider, model=None):
+        key = (provider, model)
+        with self._lock:
+            if key not in self.buckets:
+                if provider == "github":
+                    self.buckets[key] = TokenBucket(GITHUB_RPS, max(1.0, GITHUB_RPS * 2))
+                else:
+                    self.buckets[key] = TokenBucket(GROQ_RPM / 60.0, max(1.0, GROQ_RPM / 6))
+            return self.buckets[key]
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        telemetry.count(name)
+
+    def _observe(self, bucket, headers):
+        """Paces the bucket once the server reports its quota nearly spent, and pauses it once spent.
+
+        Returns the server's retry hint in seconds, if any.
+        """
+        remaining, reset, token_wait = quota(headers)
+        if remaining is not None and reset:
+            bucket.pace(remaining, reset)
+        wait = retry_after(headers)
+        pause = max(wait or 0.0, token_wait or 0.0)
+        if pause:
+            bucket.pause_until(time.monotonic() + pause)
+            self._count("throttled")
+        return wait
+
+    def observe(self, provider, model, headers):
+        """Feeds the rate-limit headers of any response (successful or not) into its bucket."""
+        return self._observe(self.bucket(provider, model), headers)
+
+    def send(self, provider, model, request):
+        """Runs ``request()`` returning a ``requests.Response``, retrying 429/5xx with backoff.
+
+        The last response is returned as-is once attempts run out, so callers keep their own
+        status handling.
+        """
+        bucket = self.bucket(provider, model)
+        for attempt in range(self.max_attempts):
+            bucket.acquire()
+            self._count("requests")
+            response = request()
+            exhausted = response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+            hint = self._observe(bucket, response.headers) if response.status_code != 304 else None
+            if response.status_code not in RETRYABLE_STATUS and not exhausted:
+                return response
+            if attempt + 1 < self.max_attempts:
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, hint))
+        return response
+
+    def call(self, provider, model, fn):
+        """Runs an SDK call, retrying exceptions that carry a retryable ``status_code``.
+
+        The calls' response headers reach the bucket through ``observe`` (the Groq client's
+        response hook, and ``streaming.stream_http``); here they only set the retry delay.
+        """
+        bucket = self.bucket(provider, model)
+        for attempt in range(self.max_attempts):
+            bucket.acquire()
+            self._count("requests")
+            try:
+                return fn()
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                response = getattr(e, "response", None)
+                hint = retry_after(getattr(response, "headers", None))
+                retryable = status in RETRYABLE_STATUS or type(e).__name__ in ("APIConnectionError", "APITimeoutError")
+                if not retryable or attempt + 1 == self.max_attempts:
+                    raise
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, hint))
+
+
+_scheduler = Scheduler()
+
+def get_scheduler():
+    """Returns the process-wide scheduler."""
+    return _scheduler
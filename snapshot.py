@@ -0,0 +1,122 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from collections import OrderedDict
+import github_api
+from http_client import get_session
+from disk_cache import CACHE_DIR
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+SNAPSHOTS_PER_REPO = int(os.getenv("CODEDOC_SNAPSHOTS_PER_REPO", "2"))
+# Recently read files kept in memory, so several issues pointing at one file share a single read
+READ_CACHE_BYTES = int(os.getenv("CODEDOC_SNAPSHOT_READ_CACHE_MB", "16")) * 1024 * 1024
+
+
+class RepoSnapshot:
+    """A branch checked out once at a fixed commit; file reads are local, with a small LRU of recent ones."""
+
+    def __init__(self, root, sha, cache_bytes=READ_CACHE_BYTES):
+        self.root = root
+        self.sha = sha
+        self.cache_bytes = cache_bytes
+        self._contents = OrderedDict()
+        self._cached = 0
+        self._lock = threading.Lock()
+
+    def has(self, file_path):
+        try:
+            return os.path.isfile(self._local(file_path))
+        except ValueError:
+            return False
+
+    def _local(self, file_path):
+        path = os.path.normpath(os.path.join(self.root, file_path))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"`{file_path}` escapes the snapshot root.")
+        return path
+
+    def read(self, file_path):
+        """Returns the file's text, from the LRU when another issue read it recently."""
+        with self._lock:
+            if file_path in self._contents:
+                self._contents.move_to_end(file_path)
+                return self._contents[file_path]
+        with open(self._local(file_path), encoding="utf-8", newline="") as f:
+            text = f.read()
+        with self._lock:
+            if file_path not in self._contents and len(text) <= self.cache_bytes:
+                self._contents[file_path] = text
+                self._cached += len(text)
+                while self._cached > self.cache_bytes:
+                    _, evicted = self._contents.popitem(last=False)
+                    self._cached -= len(evicted)
+        return text
+
+
+def resolve_commit_sha(owner, repo, branch, token):
+    """Returns the commit SHA the branch currently points at, or None."""
+    status, data, _ = github_api.github_get(f"{github_api.GITHUB_API}/repos/{owner}/{repo}/commits/{branch}", token)
+    return data.get("sha") if status == 200 and isinstance(data, dict) else None
+
+
+def _extract(archive, destination):
+    """Extracts a GitHub tarball, dropping its ``owner-repo-sha/`` top-level folder."""
+    with tarfile.open(archive, "r:gz") as tar:
+        for member in tar.getmembers():
+            parts = member.name.split("/", 1)
+            if len(parts) < 2 or not parts[1] or not (member.isfile() or member.isdir()):
+                continue
+            member.name = parts[1]
+            if os.path.isabs(member.name) or ".." in member.name.split("/"):
+                continue
+            tar.extract(member, destination, set_attrs=False)
+
+
+def _prune(repo_dir, keep):
+    """Keeps only the ``keep`` most recently used snapshots of a repository."""
+    snapshots = sorted(
+        (os.path.join(repo_dir, name) for name in os.listdir(repo_dir) if not name.startswith(".")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old in snapshots[keep:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def get_snapshot(owner, repo, branch, token):
+    """Downloads the branch tarball once per commit SHA and returns a RepoSnapshot, or None on failure."""
+    sha = resolve_commit_sha(owner, repo, branch, token)
+    if not sha:
+        return None
+    repo_dir = os.path.join(SNAPSHOT_DIR, owner, repo)
+    root = os.path.join(repo_dir, sha)
+    with _locks_guard:
+        lock = _locks.setdefault(root, threading.Lock())
+    with lock:
+        if not os.path.isdir(root):
+            os.makedirs(repo_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=repo_dir, prefix=".staging-")
+            try:
+                archive = os.path.join(staging, "snapshot.tar.gz")
+                with get_session().get(
+                    f"{github_api.GITHUB_API}/repos/{owner}/{repo}/tarball/{sha}",
+                    headers={"Authorization": f"token {token}"}, stream=True,
+                ) as response:
+                    if response.status_code != 200:
+                        print("Error:", response.status_code, "downloading snapshot")
+                        return None
+                    with open(archive, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                tree = os.path.join(staging, "tree")
+                _extract(archive, tree)
+                os.replace(tree, root)  # publish atomically
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        os.utime(root)
+        _prune(repo_dir, SNAPSHOTS_PER_REPO)
+    return RepoSnapshot(os.path.realpath(root), sha)
@@ -0,0 +1,492 @@
+"""Local stand-ins for the GitHub REST and Groq chat-completions APIs, serving synthetic repositories.
+
+    python standin.py --files 5000 --issues 200 --latency 0.05 --error-rate 0.02
+
+Point the apps at it with CODEDOC_GITHUB_API_URL and GROQ_BASE_URL (printed on start); any token
+is accepted. Only the endpoints CodeDoc calls are implemented.
+"""
+import os
+import re
+import io
+import json
+import time
+import base64
+import random
+import hashlib
+import tarfile
+import argparse
+import threading
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LANGUAGES = (".py", ".java", ".js")
+BUG_TYPES = ("NULL_DEREFERENCE", "RESOURCE_LEAK", "THREAD_SAFETY_VIOLATION")
+SEVERITIES = ("HIGH", "MEDIUM", "LOW")
+STREAM_CHUNK_CHARS = 32
+
+
+class StandinConfig:
+    """Behaviour of the stand-in services.
+
+    ``latency`` (seconds, +/- ``jitter`` as a fraction) is added to every request, and model
+    output is generated at ``tokens_per_sec``. ``error_rate`` of requests fail with a 503.
+    ``groq_rpm`` caps requests per model per minute (429 with rate-limit headers beyond it, 0 for
+    no cap); ``github_limit`` is the hourly GitHub quota (403 with ``X-RateLimit-Remaining: 0``).
+    Tree listings longer than ``tree_limit`` entries are cut off and marked ``truncated``, as
+    GitHub does at about 100k.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.2, tokens_per_sec=800, error_rate=0.0, groq_rpm=0,
+                 github_limit=5000, seed=0, tree_limit=100_000):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.groq_rpm = groq_rpm
+        self.github_limit = github_limit
+        self.seed = seed
+        self.tree_limit = tree_limit
+
+
+class SyntheticRepo:
+    """A deterministic repository of ``files`` source files and ``issues`` open issues.
+
+    Every file defines a class ``Widget<i>``. Even-numbered issues name the file's path, so the
+    path index resolves them; odd ones only name the class, so they need the LLM extraction step.
+    """
+
+    def __init__(self, owner="codedoc", name="synthetic", files=200, issues=50, branch="main",
+                 methods=8, seed=0):
+        self.owner, self.name, self.branch = owner, name, branch
+        self.methods = methods
+        self.seed = seed
+        self.paths = [self._path(i) for i in range(files)]
+        self.path_ids = {path: i for i, path in enumerate(self.paths)}
+        self.issue_count = issues
+        self.commit = hashlib.sha1(f"{owner}/{name}@{branch}:{files}:{methods}:{seed}".encode()).hexdigest()
+        self._lock = threading.Lock()
+        self._tarball = None
+        self._dirs = None
+
+    @staticmethod
+    def _path(i):
+        ext = LANGUAGES[i % len(LANGUAGES)]
+        if ext == ".java":
+            return f"src/main/java/pkg{i % 10}/Widget{i}.java"
+        return f"src/pkg{i % 10}/widget_{i}{ext}"
+
+    def index_of(self, text):
+        """The file a piece of text refers to, by path or class name (None if it names neither)."""
+        for path in re.findall(r"src/[\w/]+\.(?:py|java|js)\b", text or ""):
+            if path in self.path_ids:
+                return self.path_ids[path]
+        match = re.search(r"\bWidget(\d+)\b", text or "")
+        if match and int(match.group(1)) < len(self.paths):
+            return int(match.group(1))
+        return None
+
+    def content(self, path):
+        return _file_content(path, int(re.search(r"(\d+)\.\w+$", path).group(1)), self.methods)
+
+    def blob_sha(self, path):
+        data = self.content(path).encode("utf-8")
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    def dirs(self):
+        """Every directory, mapped from its tree SHA (the root's is the commit SHA)."""
+        with self._lock:
+            if self._dirs is None:
+                found = {os.path.dirname(p) for p in self.paths} | {
+                    "/".join(p.split("/")[:n]) for p in self.paths for n in range(1, p.count("/"))
+                }
+                self._dirs = {self.commit: "", **{hashlib.sha1(d.encode()).hexdigest(): d for d in sorted(found)}}
+            return self._dirs
+
+    def tree(self, root="", recursive=True, limit=0):
+        """Listing of directory ``root`` like the git trees API: paths relative to it, cut off
+        after ``limit`` entries (0 for no limit) with ``truncated`` set."""
+        prefix = root + "/" if root else ""
+        inside = lambda path: path.startswith(prefix) and (recursive or "/" not in path[len(prefix):])
+        entries = [{"path": d[len(prefix):], "mode": "040000", "type": "tree", "sha": sha}
+                   for sha, d in self.dirs().items() if d and inside(d)]
+        for path in self.paths:
+            if inside(path):
+                entries.append({"path": path[len(prefix):], "mode": "100644", "type": "blob",
+                                "sha": self.blob_sha(path), "size": len(self.content(path))})
+        truncated = bool(limit) and len(entries) > limit
+        sha = self.commit if not root else hashlib.sha1(root.encode()).hexdigest()
+        return {"sha": sha, "tree": entries[:limit] if truncated else entries, "truncated": truncated}
+
+    def issues(self):
+        rng = random.Random(self.seed)
+        found = []
+        for number in range(1, self.issue_count + 1):
+            i = rng.randrange(len(self.paths))
+            if number % 2 == 0:
+                body = (f"TypeError in `{self.paths[i]}`: `process()` divides by zero when `items` is empty.\n\n"
+                        "Steps: call process([]) and the exception is raised.")
+            else:
+                body = f"Widget{i}.process() throws an exception for empty input instead of returning 0."
+            found.append({
+                "number": number, "title": f"process() fails on empty input ({number})", "body": body,
+                "state": "open", "updated_at": "2024-01-01T00:00:00Z",
+                "html_url": f"https://github.com/{self.owner}/{self.name}/issues/{number}",
+            })
+        return found
+
+    def tarball(self):
+        """gzip'd tar of the tree under an ``owner-repo-sha/`` folder, like GitHub's tarball endpoint."""
+        with self._lock:
+            if self._tarball is None:
+                buffer = io.BytesIO()
+                top = f"{self.owner}-{self.name}-{self.commit[:7]}"
+                with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+                    for path in self.paths:
+                        data = self.content(path).encode("utf-8")
+                        info = tarfile.TarInfo(f"{top}/{path}")
+                        info.size = len(data)
+                        tar.addfile(info, io.BytesIO(data))
+                self._tarball = buffer.getvalue()
+            return self._tarball
+
+
+@lru_cache(maxsize=65536)
+def _file_content(path, i, methods):
+    ext = os.path.splitext(path)[1]
+    if ext == ".java":
+        helpers = "".join(f"\n    public int helper{k}(int value) {{\n        return value + {k};\n    }}\n" for k in range(methods))
+        return (f"package pkg{i % 10};\n\npublic class Widget{i} {{\n    private int size = {i % 7 + 1};\n\n"
+                "    public int process(int[] items) {\n        int total = 0;\n        for (int item : items) {\n"
+                "            total += item * size;\n        }\n        return total / items.length;\n    }\n"
+                f"{helpers}}}\n")
+    if ext == ".js":
+        helpers = "".join(f"\n  helper{k}(value) {{\n    return value + {k};\n  }}\n" for k in range(methods))
+        return (f"class Widget{i} {{\n  constructor(size = {i % 7 + 1}) {{\n    this.size = size;\n  }}\n\n"
+                "  process(items) {\n    let total = 0;\n    for (const item of items) {\n      total += item * this.size;\n"
+                f"    }}\n    return total / items.length;\n  }}\n{helpers}}}\n\nmodule.exports = Widget{i};\n")
+    helpers = "".join(f"\n    def helper_{k}(self, value):\n        return value + {k}\n" for k in range(methods))
+    return (f'"""Synthetic module {i}."""\n\n\nclass Widget{i}:\n    def __init__(self, size={i % 7 + 1}):\n'
+            "        self.size = size\n\n    def process(self, items):\n        total = 0\n        for item in items:\n"
+            f"            total += item * self.size\n        return total / len(items)\n{helpers}")
+
+
+def write_bug_corpus(directory, count, seed=0):
+    """InferredBugs-style sample folders (bug.json, method_before.txt, method_after.txt) for the IFT benchmark."""
+    rng = random.Random(seed)
+    for n in range(count):
+        sample = os.path.join(directory, "samples", f"{n:05d}")
+        os.makedirs(sample, exist_ok=True)
+        field = f"resource{n}"
+        before = (f"public int read{n}(String name) {{\n    Reader reader = open(name);\n    int total = {field}.size();\n"
+                  "    return total + reader.read();\n}\n")
+        after = (f"public int read{n}(String name) {{\n    if ({field} == null) {{\n        return 0;\n    }}\n"
+                 f"    try (Reader reader = open(name)) {{\n        return {field}.size() + reader.read();\n    }}\n}}\n")
+        meta = {"bug_type": rng.choice(BUG_TYPES), "severity": rng.choice(SEVERITIES), "line_number": 3}
+        for name, text in (("bug.json", json.dumps(meta)), ("method_before.txt", before), ("method_after.txt", after)):
+            with open(os.path.join(sample, name), "w") as f:
+                f.write(text)
+
+
+def write_review_samples(path, count, seed=0):
+    """JSONL of review-comment samples (old, hunk, comment, new) for inference.py."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for n in range(count):
+            size = rng.randint(3, 12)
+            old = "\n".join(f"int v{k} = compute({k}) + {n};" for k in range(size))
+            new = old.replace("compute(0)", "computeSafe(0)")
+            hunk = f"@@ -1,{size} +1,{size} @@\n-int v0 = compute(0) + {n};\n+int v0 = computeSafe(0) + {n};"
+            f.write(json.dumps({"old": old, "hunk": hunk, "comment": "Use computeSafe here.", "new": new}) + "\n")
+
+
+def _code_block(text, after):
+    """First fenced code block following the ``after`` marker."""
+    start = text.find(after)
+    match = re.search(r"```[\w+-]*\n(.*?)\n```", text[start:] if start >= 0 else text, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Serves the GitHub and Groq endpoints from one local port; ``url`` is the base for both."""
+
+    daemon_threads = True
+
+    def __init__(self, repos, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.repos = {(r.owner, r.name): r for r in repos}
+        self.config = config or StandinConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.groq_window = {}
+        self.github_used = 0
+        self.github_reset = int(time.time()) + 3600
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, route, status):
+        with self.lock:
+            key = f"{route} {status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def requests_served(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def delay(self, extra=0.0):
+        with self.lock:
+            factor = 1 + self.rng.uniform(-self.config.jitter, self.config.jitter)
+        time.sleep(max(0.0, self.config.latency * factor + extra))
+
+    def inject_error(self):
+        with self.lock:
+            return self.rng.random() < self.config.error_rate
+
+    def groq_admit(self, model):
+        """(allowed, headers) under the per-model requests-per-minute cap."""
+        rpm = self.config.groq_rpm
+        with self.lock:
+            now = time.monotonic()
+            window = [t for t in self.groq_window.get(model, []) if now - t < 60]
+            allowed = not rpm or len(window) < rpm
+            if allowed:
+                window.append(now)
+            self.groq_window[model] = window
+            reset = 60 - (now - window[0]) if window else 0.0
+            remaining = max(0, rpm - len(window)) if rpm else 1000000
+        headers = {"x-ratelimit-limit-requests": str(rpm or 1000000),
+                   "x-ratelimit-remaining-requests": str(remaining),
+                   "x-ratelimit-reset-requests": f"{reset:.2f}s"}
+        if not allowed:
+            headers["retry-after"] = f"{max(0.1, reset):.2f}"
+        return allowed, headers
+
+    def github_admit(self):
+        with self.lock:
+            now = time.time()
+            if now >= self.github_reset:
+                self.github_used, self.github_reset = 0, int(now) + 3600
+            allowed = self.github_used < self.config.github_limit
+            if allowed:
+                self.github_used += 1
+            remaining = self.config.github_limit - self.github_used
+        return allowed, {"X-RateLimit-Limit": str(self.config.github_limit),
+                         "X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(self.github_reset)}
+
+    def find_repo(self, text):
+        for repo in self.repos.values():
+            i = repo.index_of(text)
+            if i is not None:
+                return repo.paths[i]
+        return None
+
+    def completion(self, payload):
+        """Deterministic answer to one of CodeDoc's prompts, chosen by recognising the prompt."""
+        messages = payload.get("messages") or []
+        system = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+        user = (messages[-1].get("content") or "") if messages else ""
+        if "### Issue " in user:
+            blocks = re.split(r"^### Issue (\S+)\n", user, flags=re.MULTILINE)[1:]
+            return json.dumps({"paths": {key: self.find_repo(body) for key, body in zip(blocks[::2], blocks[1::2])}})
+        if "extracts file paths" in system:
+            return self.find_repo(user) or "not there"
+        if "Root Cause" in system:
+            language = re.search(r"### Buggy Code:\n```(\w*)", user)
+            code = _code_block(user, "### Buggy Code:")
+            return (f"**Root Cause:** `process()` divides by the item count without checking for empty input.\n\n"
+                    f"**Fixed Code:**\n```{language.group(1) if language else ''}\n{code}\n```\n\n"
+                    "**Explanation:** Returning early for empty input avoids the division by zero.")
+        if "Buggy Method:" in user:
+            return f"```java\n{_code_block(user, 'Buggy Method:')}\n```"
+        if "Original Code:" in user:
+            match = re.search(r"Original Code:\n(.*?)\n\nDiff:", user, re.DOTALL)
+            return match.group(1) if match else ""
+        return "OK"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        match = re.match(r"^/repos/([^/]+)/([^/]+)/(issues|git/trees|contents|commits|tarball)(?:/(.*))?$", url.path)
+        route = match.group(3) if match else "unknown"
+        server.delay()
+        if not match or (match.group(1), match.group(2)) not in server.repos:
+            server.count(route, 404)
+            return self._send(404, {"message": "Not Found"})
+        repo = server.repos[(match.group(1), match.group(2))]
+        rest = unquote(match.group(4) or "")
+        allowed, headers = server.github_admit()
+        if not allowed:
+            server.count(route, 403)
+            return self._send(403, {"message": "API rate limit exceeded"}, headers)
+        if server.inject_error():
+            server.count(route, 503)
+            return self._send(503, {"message": "Service Unavailable"}, headers)
+
+        if route == "tarball":
+            server.count(route, 200)
+            return self._send(200, repo.tarball(), headers, "application/x-gzip")
+        if route == "issues":
+            per_page, page = int(query.get("per_page", 30)), int(query.get("page", 1))
+            issues = repo.issues()
+            data = issues[(page - 1) * per_page:page * per_page]
+            if page * per_page < len(issues):
+                nxt = f"http://{self.headers.get('Host')}{url.path}?state=open&per_page={per_page}&page={page + 1}"
+                headers["Link"] = f'<{nxt}>; rel="next"'
+        elif route == "git/trees":
+            root = "" if rest == repo.branch else repo.dirs().get(rest)
+            recursive = query.get("recursive") not in (None, "", "0", "false")
+            data = repo.tree(root, recursive, server.config.tree_limit) if root is not None else None
+        elif route == "commits":
+            data = {"sha": repo.commit} if rest in (repo.branch, repo.commit) else None
+        else:
+            data = None
+            if rest in repo.path_ids:
+                content = repo.content(rest).encode("utf-8")
+                data = {"type": "file", "path": rest, "sha": repo.blob_sha(rest), "size": len(content),
+                        "encoding": "base64", "content": base64.encodebytes(content).decode("ascii")}
+        if data is None:
+            server.count(route, 404)
+            return self._send(404, {"message": "Not Found"}, headers)
+
+        body = json.dumps(data).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            server.count(route, 304)
+            return self._send(304, b"", headers)
+        server.count(route, 200)
+        return self._send(200, body, headers)
+
+    def do_POST(self):
+        server = self.server
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path != "/openai/v1/chat/completions":
+            server.count("unknown", 404)
+            return self._send(404, {"error": {"message": "Not Found"}})
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            server.count("chat", 400)
+            return self._send(400, {"error": {"message": "invalid JSON"}})
+        model = payload.get("model", "")
+        allowed, headers = server.groq_admit(model)
+        server.delay()
+        if not allowed:
+            server.count("chat", 429)
+            return self._send(429, {"error": {"message": "Rate limit reached", "type": "tokens"}}, headers)
+        if server.inject_error():
+            server.count("chat", 503)
+            return self._send(503, {"error": {"message": "Service Unavailable"}}, headers)
+
+        text = server.completion(payload)
+        prompt_tokens = sum(len(m.get("content") or "") for m in payload.get("messages") or []) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4 + 1}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{hashlib.sha1(body).hexdigest()[:12]}", "created": int(time.time()), "model": model}
+        per_char = 1.0 / (4 * server.config.tokens_per_sec) if server.config.tokens_per_sec else 0.0
+        server.count("chat", 200)
+        if not payload.get("stream"):
+            time.sleep(len(text) * per_char)
+            return self._send(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop", "logprobs": None},
+            ]}, headers)
+
+        # Server-sent events; the connection closes at the end instead of using chunked encoding
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.close_connection = True
+        chunk = lambda delta, finish=None, **extra: (
+            "data: " + json.dumps({**base, "object": "chat.completion.chunk", **extra, "choices": [
+                {"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}]}) + "\n\n"
+        ).encode("utf-8")
+        try:
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for i in range(0, len(text), STREAM_CHUNK_CHARS):
+                piece = text[i:i + STREAM_CHUNK_CHARS]
+                time.sleep(len(piece) * per_char)
+                self.wfile.write(chunk({"content": piece}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, "stop", x_groq={"id": base["id"], "usage": usage}))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled, e.g. a hedged request that lost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stand-ins for the GitHub and Groq APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--owner", default="codedoc")
+    parser.add_argument("--repo", default="synthetic")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--issues", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency variation, as a fraction")
+    parser.add_argument("--tokens-per-sec", type=float, default=800, help="model generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail with 503")
+    parser.add_argument("--groq-rpm", type=int, default=0, help="requests per model per minute (0 = no cap)")
+    parser.add_argument("--github-limit", type=int, default=5000, help="GitHub requests per hour")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tree-limit", type=int, default=100_000, help="entries per tree listing before it is truncated")
+    args = parser.parse_args(argv)
+
+    config = StandinConfig(args.latency, args.jitter, args.tokens_per_sec, args.error_rate, args.groq_rpm,
+                           args.github_limit, args.seed, args.tree_limit)
+    repo = SyntheticRepo(args.owner, args.repo, args.files, args.issues, seed=args.seed)
+    server = StandinServer([repo], config, args.host, args.port)
+    print(f"Serving https://github.com/{args.owner}/{args.repo} ({args.files} files, {args.issues} issues)")
+    print(f"  export CODEDOC_GITHUB_API_URL={server.url} GROQ_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
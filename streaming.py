@@ -0,0 +1,151 @@
+import re
+import json
+import time
+from http_client import get_session
+from scheduler import get_scheduler
+
+SECTION_RE = re.compile(r"\*\*(Root Cause|Fixed Code|Explanation):\*\*")
+UI_REFRESH_SECONDS = 0.15
+
+
+class StreamError(RuntimeError):
+    """Non-200 reply to a streaming request; carries the status and response for retry logic."""
+
+    def __init__(self, response):
+        super().__init__(f"API error {response.status_code}: {response.text}")
+        self.status_code = response.status_code
+        self.response = response
+
+
+def new_stats(model):
+    return {"model": model, "cached": False, "ttft": None, "duration": None,
+            "prompt_tokens": None, "completion_tokens": None, "tokens_per_sec": None}
+
+
+def finish_stats(stats, start, first_token_at, text, usage=None):
+    """Fills in time-to-first-token, total duration and generation throughput."""
+    end = time.perf_counter()
+    stats["duration"] = round(end - start, 3)
+    stats["ttft"] = round(first_token_at - start, 3) if first_token_at else None
+    usage_field = lambda name: usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    tokens = usage_field("completion_tokens") if usage is not None else None
+    stats["prompt_tokens"] = usage_field("prompt_tokens") if usage is not None else None
+    stats["completion_tokens"] = tokens if tokens is not None else len(text) // 4
+    generating = end - (first_token_at or start)
+    stats["tokens_per_sec"] = round(stats["completion_tokens"] / generating, 1) if generating > 0 else None
+    return stats
+
+
+class Throttle:
+    """Calls ``callback`` at most every UI_REFRESH_SECONDS, plus once at the end."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.last = 0.0
+
+    def __call__(self, text, final=False):
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if final or now - self.last >= UI_REFRESH_SECONDS:
+            self.last = now
+            self.callback(text)
+
+
+def stream_groq(client, model, messages, on_text=None, stats=None, **params):
+    """Streams a chat completion through the Groq SDK. Returns the full text.
+
+    ``on_text`` receives the accumulated text as it grows; ``stats`` is filled with timings.
+    """
+    stats = stats if stats is not None else new_stats(model)
+    throttle = Throttle(on_text)
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    for chunk in client.chat.completions.create(model=model, messages=messages, stream=True, **params):
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            usage = x_groq.usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(delta)
+            throttle("".join(parts))
+    text = "".join(parts)
+    throttle(text, final=True)
+    finish_stats(stats, start, first_token_at, text, usage)
+    return text
+
+
+def stream_http(url, headers, payload, on_text=None, stats=None):
+    """Streams an OpenAI-compatible chat completion over raw HTTP (server-sent events)."""
+    stats = stats if stats is not None else new_stats(payload.get("model"))
+    throttle = Throttle(on_text)
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    with get_session().post(url, headers=headers, json=dict(payload, stream=True), stream=True) as r:
+        get_scheduler().observe("groq", payload.get("model"), r.headers)
+        if r.status_code != 200:
+            raise StreamError(r)
+        for line in r.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            usage = (event.get("x_groq") or {}).get("usage") or event.get("usage") or usage
+            choices = event.get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+                throttle("".join(parts))
+    text = "".join(parts)
+    throttle(text, final=True)
+    finish_stats(stats, start, first_token_at, text, usage)
+    return text
+
+
+def timed_call(call, stats):
+    """Runs a non-streaming completion, recording its duration in ``stats``."""
+    start = time.perf_counter()
+    text = call()
+    finish_stats(stats, start, None, text)
+    return text
+
+
+def settle_stats(stats):
+    """Marks stats as a cache hit when no request was actually made."""
+    if stats is not None and stats["duration"] is None:
+        stats["cached"] = True
+    return stats
+
+
+def parse_partial_sections(text):
+    """Splits a response that may still be arriving into its Root Cause / Fixed Code / Explanation parts."""
+    sections = {}
+    matches = list(SECTION_RE.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if match.group(1) == "Fixed Code":
+            body = re.sub(r"^```\w*\n?", "", body)
+            body = re.sub(r"\n?```\s*$", "", body)
+        sections[match.group(1)] = body
+    return sections
+
+
+def format_stats(stats):
+    if not stats:
+        return ""
+    if stats.get("cached"):
+        return f"⚡ {stats['model']}: served from cache"
+    ttft = f"{stats['ttft']:.2f}s" if stats.get("ttft") is not None else "n/a"
+    tps = f"{stats['tokens_per_sec']:.0f} tok/s" if stats.get("tokens_per_sec") else "n/a"
+    return f"⏱️ {stats['model']}: first token {ttft}, total {stats['duration']:.2f}s, {stats['completion_tokens']} tokens at {tps}"
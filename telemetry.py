@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from disk_cache import CACHE_DIR
+
+METRICS_DIR = os.getenv("CODEDOC_METRICS_DIR", os.path.join(CACHE_DIR, "metrics"))
+COUNTERS = ("prompt_tokens", "completion_tokens", "cache_hits", "requests", "retries", "throttled")
+
+_local = threading.local()
+
+
+class Run:
+    """Per-item stage spans (wall time, tokens, cache hits, retries) for one pipeline run."""
+
+    def __init__(self, app):
+        self.app = app
+        self.run_id = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        span.setdefault("seconds", 0.0)
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """One row per stage, in the order stages first appeared."""
+        by_stage = {}
+        for span in list(self.spans):
+            by_stage.setdefault(span["stage"], []).append(span)
+        rows = []
+        for stage, spans in by_stage.items():
+            seconds = sorted(s["seconds"] for s in spans)
+            row = {
+                "Stage": stage,
+                "Items": len(spans),
+                "Total (s)": round(sum(seconds), 3),
+                "p50 (s)": round(percentile(seconds, 0.5), 3),
+                "p95 (s)": round(percentile(seconds, 0.95), 3),
+                "Max (s)": round(seconds[-1], 3),
+                "Errors": sum(1 for s in spans if s.get("error")),
+            }
+            for name in COUNTERS:
+                row[name] = sum(s.get(name) or 0 for s in spans)
+            rows.append(row)
+        return rows
+
+    def to_jsonl(self):
+        meta = {"app": self.app, "run_id": self.run_id}
+        return "".join(json.dumps({**meta, **span}, default=str) + "\n" for span in list(self.spans))
+
+    def to_prometheus(self):
+        """Prometheus text exposition of the run, for node_exporter's textfile collector."""
+        lines = [
+            "# HELP codedoc_stage_seconds Wall time per item of a pipeline stage in the last run.",
+            "# TYPE codedoc_stage_seconds summary",
+        ]
+        rows = self.summary()
+        by_stage = {}
+        for span in list(self.spans):
+            by_stage.setdefault(span["stage"], []).append(span["seconds"])
+        for row in rows:
+            labels = f'app="{self.app}",stage="{row["Stage"]}"'
+            seconds = sorted(by_stage[row["Stage"]])
+            for q in (0.5, 0.95):
+                lines.append(f'codedoc_stage_seconds{{{labels},quantile="{q}"}} {percentile(seconds, q):.6f}')
+            lines.append(f"codedoc_stage_seconds_sum{{{labels}}} {sum(seconds):.6f}")
+            lines.append(f"codedoc_stage_seconds_count{{{labels}}} {len(seconds)}")
+        for name in COUNTERS + ("errors",):
+            lines.append(f"# TYPE codedoc_stage_{name} gauge")
+            for row in rows:
+                value = row["Errors"] if name == "errors" else row[name]
+                lines.append(f'codedoc_stage_{name}{{app="{self.app}",stage="{row["Stage"]}"}} {value}')
+        lines.append("# TYPE codedoc_last_run_timestamp_seconds gauge")
+        lines.append(f'codedoc_last_run_timestamp_seconds{{app="{self.app}"}} {self.started:.0f}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=METRICS_DIR):
+        """Appends the spans to ``stages.jsonl`` and rewrites ``codedoc_<app>.prom``. Returns both paths."""
+        os.makedirs(directory, exist_ok=True)
+        jsonl_path = os.path.join(directory, "stages.jsonl")
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            f.write(self.to_jsonl())
+        prom_path = os.path.join(directory, f"codedoc_{self.app}.prom")
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, prom_path)  # the collector must never see a half-written file
+        return jsonl_path, prom_path
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+@contextmanager
+def activate(run):
+    """Makes ``run`` the current thread's target for ``stage``/``count``/``note``."""
+    previous = getattr(_local, "run", None), getattr(_local, "stack", [])
+    _local.run, _local.stack = run, []
+    try:
+        yield run
+    finally:
+        _local.run, _local.stack = previous
+
+
+def current():
+    """(run, item) of this thread, so work handed to other threads can record into the same span tree."""
+    stack = getattr(_local, "stack", None)
+    return getattr(_local, "run", None), stack[-1]["item"] if stack else None
+
+
+@contextmanager
+def stage(name, item=None, **fields):
+    """Times a pipeline stage for the active run; a no-op outside ``activate``.
+
+    Nested stages inherit ``item`` from the enclosing one.
+    """
+    run = getattr(_local, "run", None)
+    if item is None and getattr(_local, "stack", None):
+        item = _local.stack[-1]["item"]
+    span = {"stage": name, "item": item, **fields}
+    if run is None:
+        yield span
+        return
+    _local.stack.append(span)
+    start = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span["error"] = str(e)
+        raise
+    finally:
+        span["seconds"] = round(time.perf_counter() - start, 6)
+        _local.stack.pop()
+        run.add(span)
+
+
+def count(name, n=1):
+    """Adds to a counter on the innermost open stage of this thread, if any."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1][name] = (stack[-1].get(name) or 0) + n
+
+
+def note(**fields):
+    """Sets fields on the innermost open stage of this thread, if any."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].update(fields)
+
+
+def note_llm(stats):
+    """Copies model, token counts and time-to-first-token from a streaming stats dict onto the current stage."""
+    if stats:
+        note(model=stats.get("model"), prompt_tokens=stats.get("prompt_tokens"),
+             completion_tokens=stats.get("completion_tokens"),
+             ttft=stats.get("ttft"))
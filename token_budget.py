@@ -0,0 +1,140 @@
+import os
+import threading
+
+TOKENIZER_DIR = os.getenv("CODEDOC_TOKENIZER_DIR", "")
+SAFETY_MARGIN = float(os.getenv("CODEDOC_TOKEN_MARGIN", "0.05"))
+MESSAGE_OVERHEAD = 5  # chat template tokens around each message (role header, end-of-turn)
+REQUEST_OVERHEAD = 3
+HEURISTIC_CHARS_PER_TOKEN = 3.0  # deliberately pessimistic for code
+# How far a backend's count may fall short of the model's real count; capacities shrink by this much.
+# cl100k_base is the base of Llama 3's vocabulary, but Mistral's and Gemma's tokenizers split code
+# into noticeably more tokens, and the characters-per-token guess is off by a third on dense code.
+COUNT_ERROR = {"model": 0.0, "family": 0.02, "cl100k_llama3": 0.05, "cl100k": 0.25, "heuristic": 0.35}
+
+# context / max_output in tokens; tier: rough answer quality (3 = best); price: $ per million tokens (in, out)
+MODELS = {
+    "llama-3.3-70b-versatile": {"family": "llama3", "context": 131072, "max_output": 32768, "tier": 3, "price": (0.59, 0.79)},
+    "llama3-70b-8192": {"family": "llama3", "context": 8192, "max_output": 8192, "tier": 2, "price": (0.59, 0.79)},
+    "mixtral-8x7b-32768": {"family": "mistral", "context": 32768, "max_output": 32768, "tier": 2, "price": (0.24, 0.24)},
+    "gemma2-9b-it": {"family": "gemma", "context": 8192, "max_output": 8192, "tier": 1, "price": (0.20, 0.20)},
+    "llama3-8b-8192": {"family": "llama3", "context": 8192, "max_output": 8192, "tier": 1, "price": (0.05, 0.08)},
+}
+DEFAULT_MODEL = {"family": None, "context": 8192, "max_output": 4096, "tier": 1, "price": (1.0, 1.0)}
+
+
+class PromptTooLarge(ValueError):
+    """No candidate model can take the prompt plus the expected completion."""
+
+
+def model_info(model):
+    return MODELS.get(model, DEFAULT_MODEL)
+
+
+class Counter:
+    """Token counter for one model family.
+
+    Uses the model's own tokenizer (``<model>.json`` or ``<family>.json`` in CODEDOC_TOKENIZER_DIR,
+    loaded with the ``tokenizers`` package) when available, then tiktoken's cl100k_base (which
+    Llama 3's vocabulary extends), and finally a pessimistic characters-per-token estimate.
+    """
+
+    def __init__(self, model):
+        self.backend = "heuristic"
+        self.error = COUNT_ERROR["heuristic"]
+        self._encode = None
+        family = model_info(model)["family"]
+        for name in (model, family):
+            path = os.path.join(TOKENIZER_DIR, f"{name}.json") if TOKENIZER_DIR and name else None
+            if path and os.path.exists(path):
+                try:
+                    from tokenizers import Tokenizer
+                    tokenizer = Tokenizer.from_file(path)
+                    self._encode = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+                    self.backend = f"tokenizer:{name}"
+                    self.error = COUNT_ERROR["model" if name == model else "family"]
+                    return
+                except ImportError:
+                    break
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+            self._encode = lambda text: len(encoding.encode(text, disallowed_special=()))
+            self.backend = "tiktoken:cl100k_base"
+            self.error = COUNT_ERROR["cl100k_llama3" if family == "llama3" else "cl100k"]
+        except Exception:
+            pass  # not installed, or its vocabulary cannot be downloaded (offline)
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self._encode is not None:
+            return self._encode(text)
+        return int(len(text) / HEURISTIC_CHARS_PER_TOKEN) + 1
+
+
+_counters = {}
+_lock = threading.Lock()
+
+def get_counter(model):
+    with _lock:
+        if model not in _counters:
+            _counters[model] = Counter(model)
+        return _counters[model]
+
+
+def count_tokens(text, model):
+    return get_counter(model).count(text)
+
+
+def count_messages(messages, model):
+    """Prompt size of a chat request, including the per-message template overhead."""
+    counter = get_counter(model)
+    return REQUEST_OVERHEAD + sum(MESSAGE_OVERHEAD + counter.count(m["content"]) for m in messages)
+
+
+def prompt_capacity(model, completion_tokens):
+    """Prompt tokens, as counted by ``count_tokens``, that still fit next to ``completion_tokens`` of output.
+
+    Besides the safety margin, the window shrinks by the counting backend's possible error, so
+    an undercounted prompt still fits when only the heuristic is available.
+    """
+    room = int(model_info(model)["context"] * (1 - SAFETY_MARGIN)) - completion_tokens
+    return int(room / (1 + get_counter(model).error))
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    price_in, price_out = model_info(model)["price"]
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+
+def route(messages, candidates, completion_tokens, min_tier=1):
+    """Cheapest candidate whose context window and quality tier fit the request.
+
+    Returns (model, prompt_tokens). Ties go to the smaller context window (the faster
+    deployment), then to candidate order. Raises PromptTooLarge when nothing fits.
+    """
+    best = None
+    needed = {}
+    for order, model in enumerate(candidates):
+        info = model_info(model)
+        if info["tier"] < min_tier:
+            continue
+        prompt_tokens = needed[model] = count_messages(messages, model)
+        if prompt_tokens > prompt_capacity(model, min(completion_tokens, info["max_output"])):
+            continue
+        key = (estimate_cost(model, prompt_tokens, completion_tokens), info["context"], order)
+        if best is None or key < best[0]:
+            best = (key, model, prompt_tokens)
+    if best is None:
+        detail = ", ".join(f"{m}: {n} of {prompt_capacity(m, completion_tokens)}" for m, n in needed.items())
+        raise PromptTooLarge(f"Prompt does not fit any model at tier {min_tier} or above ({detail or 'no candidates'})")
+    return best[1], best[2]
+
+
+def completion_budget(model, expected_tokens, floor=1024):
+    """``max_tokens`` for a request expected to produce about ``expected_tokens``.
+
+    Leaves room for twice the expected output but never goes below ``floor`` (so short
+    requests keep their existing setting) or above the model's output limit.
+    """
+    return min(model_info(model)["max_output"], max(floor, 2 * expected_tokens))